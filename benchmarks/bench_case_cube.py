@@ -0,0 +1,28 @@
+# Compares the dense case cube with the monthly DataFrame: memory, and region x month sums
+# usage: python benchmarks/bench_case_cube.py [repeats]
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from measles_data.cube import CaseCube
+from measles_data.queries import get_monthly_cases, get_aggregated_cases
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    frame = get_monthly_cases()
+    cube = CaseCube.from_database()
+
+    frame_bytes = frame.memory_usage(deep=True).sum()
+    print(f"DataFrame: {frame_bytes / 1e6:8.2f} MB")
+    print(f"cube:      {cube.nbytes / 1e6:8.2f} MB  ({cube.nbytes / frame_bytes:.0%} of the DataFrame)")
+
+    calls = [
+        ('pandas groupby', lambda: frame.groupby(['region', 'date'])['measles_total'].sum()),
+        ('SQL rollup', lambda: get_aggregated_cases('measles_total', group_by=('region', 'date'))),
+        ('cube', lambda: cube.sum_by_region('measles_total')),
+    ]
+    for name, call in calls:
+        best = min(timeit.repeat(call, number=10, repeat=repeats)) / 10
+        print(f"{name:>15}: {best * 1e6:10.1f} us per region x month sum")
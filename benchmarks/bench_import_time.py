@@ -0,0 +1,50 @@
+# Measures how long a fresh interpreter takes to import each data-layer module
+# and checks that importing them has no side effects (no output, no new DB file)
+# usage: python benchmarks/bench_import_time.py [repeats]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODULES = [
+    'measles_data',
+    'measles_data.models',
+    'measles_data.queries',
+    'measles_data.cache',
+    'measles_data.etl',
+    'database_retrieve',
+    'database_create',
+    'db',
+]
+
+def import_time(module, repeats, env):
+    # Best wall time of a fresh `python -c "import module"`, minus the bare interpreter startup
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', f'import {module}'], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result.stdout
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        # Point the models at a path that does not exist yet, so any eager connection would create it
+        db_path = Path(tmp) / 'import_check.db'
+        env = dict(os.environ, CASE_DB_PATH=str(db_path))
+        baseline, _ = import_time('sys', repeats, env)
+        print(f"{'interpreter startup':<24} {baseline * 1000:8.1f} ms")
+        for module in MODULES:
+            elapsed, stdout = import_time(module, repeats, env)
+            notes = []
+            if stdout:
+                notes.append(f"printed {len(stdout.splitlines())} lines")
+            if db_path.exists():
+                notes.append("opened the database")
+                db_path.unlink()
+            print(f"{module:<24} {(elapsed - baseline) * 1000:8.1f} ms  {'; '.join(notes) or 'no side effects'}")
@@ -0,0 +1,30 @@
+# Compares the dict-per-row and columnar paths of get_monthly_cases
+# usage: python benchmarks/bench_monthly_cases.py [repeats]
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+from measles_data.queries import get_monthly_cases
+
+def dict_path():
+    # The original path plus the pd.to_datetime every page used to run
+    df = get_monthly_cases(bulk=False, backend='sql')
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def bulk_path():
+    return get_monthly_cases(bulk=True, backend='sql')
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rows = len(bulk_path())
+    results = {}
+    for name, func in [('dict', dict_path), ('bulk', bulk_path)]:
+        func()  # warm up the SQLite page cache
+        best = min(timeit.repeat(func, number=1, repeat=repeats))
+        results[name] = best
+        print(f"{name:>5}: {best * 1000:8.1f} ms  ({rows / best:,.0f} rows/s)")
+    print(f"speedup: {results['dict'] / results['bulk']:.1f}x over {rows} rows")
@@ -0,0 +1,211 @@
+# Repeatable benchmark suite for the ETL, the query layer and the page computations.
+# Runs without Streamlit: every scale is loaded into a temporary database built from the
+# bundled CSVs tiled `scale` times (copy c > 0 of each country gets iso3 + str(c)), and
+# --synthetic N adds datasets of N generated locations (measles_data.synthetic), so the
+# shipped measles_rubella.db is never touched. Results go to a JSON file; --compare prints
+# the change against an earlier run.
+# usage: python benchmarks/bench_suite.py [--scales 1 10 100] [--synthetic N ...] [--repeats N] [--output FILE] [--compare OLD.json]
+# (1000x works as well, but needs ~23M rows worth of disk, memory and time)
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import pandas as pd
+
+from measles_data import connection, etl
+from measles_data import animation, cache, decomposition, seasonal, synthetic
+from measles_data.queries import (get_monthly_cases, get_aggregated_cases, get_cases_by_country,
+                                  get_cases_by_date_range, get_cases, get_top_incidence, get_bottom_lab_confirmed_ratio)
+
+ALL_REGIONS = ['AFR', 'AMR', 'SEAR', 'EUR', 'EMR', 'WPR']
+DEFAULT_SCALES = [1, 10, 100]
+
+def write_scaled_csvs(scale, out_dir):
+    # cases_year.csv / cases_month.csv with every country repeated scale times
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name in ('cases_year.csv', 'cases_month.csv'):
+        source = pd.read_csv(ROOT / name, keep_default_na=False, dtype=str)
+        with open(out_dir / name, 'w', newline='') as out:
+            for copy in range(scale):
+                part = source
+                if copy:
+                    part = source.assign(iso3=source['iso3'] + str(copy), country=source['country'] + f' #{copy}')
+                part.to_csv(out, index=False, header=copy == 0)
+    return out_dir / 'cases_year.csv', out_dir / 'cases_month.csv'
+
+def timed(func, repeats=1, setup=None):
+    # Runs func repeats times (setup before each run, untimed); returns timings in seconds.
+    # The helpers' progress prints are swallowed so they do not clutter the report.
+    runs = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - start)
+    return {'best': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+def etl_workloads(year_path, month_path, db):
+    # Full rebuild, an unchanged incremental pass, a pass over a fresh database, and the post-load steps
+    def fresh_incremental():
+        fresh = db.with_name(db.stem + '-incremental.db')
+        connection.configure(fresh, read_only=False)
+        try:
+            etl.load_incremental(year_path, month_path)
+        finally:
+            connection.configure(db, read_only=False)
+            fresh.unlink(missing_ok=True)
+
+    return [
+        ('full load (--bulk)', lambda: etl.load_bulk(year_path, month_path)),
+        ('incremental load, nothing changed', lambda: etl.load_incremental(year_path, month_path)),
+        ('incremental load into an empty database', fresh_incremental),
+        ('seasonal decomposition refresh', decomposition.refresh_decompositions),
+        ('snapshot write', etl.write_snapshot),
+    ]
+
+def query_workloads(iso3, codes):
+    return [
+        ('get_monthly_cases (sql)', lambda: get_monthly_cases(backend='sql'), None),
+        ('get_monthly_cases (snapshot)', lambda: get_monthly_cases(backend='snapshot'), None),
+        ('get_cases_by_country', lambda: get_cases_by_country(iso3), None),
+        ('get_cases_by_date_range', lambda: get_cases_by_date_range('2019-01-01', '2019-12-31'), None),
+        ('get_cases_by_date_range, one country', lambda: get_cases_by_date_range('2019-01-01', '2019-12-31', iso3), None),
+        ('get_cases, 20 countries (models)', lambda: get_cases(codes[:20]), None),
+        ('get_cases, 20 countries (frame)', lambda: get_cases(codes[:20], as_frame=True), None),
+    ]
+
+def map_binning(data, column='measles_total', date='2019-01-01'):
+    # What the Static Global Map page does for one month
+    selected = data.loc[(data['date'] == pd.Timestamp(date)) & data[column].notna(), ['country', 'iso3', column]].copy()
+    upper = max(1001, (selected[column].max() if len(selected) else 0) + 1)
+    selected['category'] = pd.cut(selected[column], bins=[0, 50, 200, 1000, upper],
+                                  labels=['0-50', '50-200', '200-1000', '1000+'], include_lowest=True)
+    selected['visible_size'] = selected[column] + 20
+    return selected
+
+def page_workloads():
+    # (name, call, setup); setups clear the memoized results so every run does the full work
+    def time_series_pivot():
+        summed = get_aggregated_cases('measles_total', regions=ALL_REGIONS, group_by=('date', 'region'))
+        return summed.pivot(index='date', columns='region', values='measles_total')
+
+    return [
+        ('dataset load (get_dataset)', cache.get_dataset, cache.clear_cache),
+        ('time series pivot', time_series_pivot, None),
+        ('stored decomposition', lambda: decomposition.get_decomposition('measles_total', ALL_REGIONS),
+         decomposition._decomposition.cache_clear),
+        ('decomposition of a region subset', lambda: decomposition.get_decomposition('measles_total', ['AFR', 'EUR']),
+         decomposition._decomposition.cache_clear),
+        ('seasonal stats', lambda: seasonal.get_seasonal_stats('measles_total', ALL_REGIONS),
+         seasonal._seasonal_stats.cache_clear),
+        ('map binning', lambda: map_binning(cache.get_dataset()), None),
+        ('animated map frames', lambda: animation.frame_grid('measles_total', 2012, 2025),
+         animation._frame_grid.cache_clear),
+        ('healthcare ranking', lambda: (get_top_incidence(20), get_bottom_lab_confirmed_ratio(20)), None),
+    ]
+
+def run_dataset(dataset, year_path, month_path, repeats):
+    # Loads one dataset into a database next to its CSVs and times every workload against it
+    db = month_path.with_name('measles_rubella.db')
+    codes = pd.read_csv(month_path, usecols=['iso3'])['iso3']
+    rows = len(codes)
+    # India where it exists (a large country), else its first synthetic unit
+    iso3 = 'IND' if (codes == 'IND').any() else codes[codes.str.startswith('IND')].min()
+    print(f"\n== {dataset}: {rows:,} monthly rows ==")
+    results = []
+
+    def record(group, name, timing):
+        results.append({'dataset': dataset, 'rows': rows, 'group': group, 'name': name, **timing})
+        print(f"{group:>6} | {name:<42} {timing['best'] * 1000:10.1f} ms (median {timing['median'] * 1000:.1f})")
+
+    connection.configure(db, read_only=False)
+    for name, call in etl_workloads(year_path, month_path, db):
+        # loads are expensive and change the database, so they run once
+        record('etl', name, timed(call))
+
+    connection.configure(db)
+    cache.clear_cache()
+    for name, call, setup in query_workloads(iso3, codes.unique().tolist()):
+        timed(call)  # warm up the SQLite page cache
+        record('query', name, timed(call, repeats, setup))
+    for name, call, setup in page_workloads():
+        timed(call)
+        record('page', name, timed(call, repeats, setup))
+    cache.clear_cache()
+    return results
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sqlite': sqlite3.sqlite_version,
+    }
+
+def compare(results, previous_path):
+    # Prints best-time ratios (new / old) for the benchmarks both runs have
+    previous = json.loads(Path(previous_path).read_text())
+    old = {(r['dataset'], r['group'], r['name']): r['best'] for r in previous['results']}
+    print(f"\nCompared with {previous_path} ({previous['environment'].get('commit')}):")
+    for r in results:
+        key = (r['dataset'], r['group'], r['name'])
+        if key in old and old[key] > 0:
+            ratio = r['best'] / old[key]
+            flag = '  slower' if ratio > 1.1 else '  faster' if ratio < 0.9 else ''
+            print(f"{r['dataset']:>15} {r['group']:>6} | {r['name']:<42} {ratio:6.2f}x{flag}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the ETL, the query layer and the page computations.")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help="Copies of the bundled CSVs to load (default: 1 10 100).")
+    parser.add_argument('--synthetic', type=int, nargs='*', default=[],
+                        help="Also benchmark generated datasets with these numbers of locations.")
+    parser.add_argument('--repeats', type=int, default=3, help="Runs per query/page benchmark; the best is kept.")
+    parser.add_argument('--output', type=Path, default=None,
+                        help="JSON results file (default: benchmarks/results-<UTC time>.json).")
+    parser.add_argument('--compare', type=Path, default=None, help="Earlier results file to compare against.")
+    parser.add_argument('--work-dir', type=Path, default=None,
+                        help="Where the scaled CSVs and databases go (default: a temporary directory).")
+    args = parser.parse_args()
+
+    report = {'environment': environment(), 'repeats': args.repeats, 'results': []}
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        try:
+            for scale in args.scales:
+                year_path, month_path = write_scaled_csvs(scale, Path(work_dir) / f'x{scale}')
+                report['results'] += run_dataset(f'{scale}x', year_path, month_path, args.repeats)
+            for locations in args.synthetic:
+                paths = synthetic.write_csvs(Path(work_dir) / f'synthetic-{locations}', locations=locations)
+                report['results'] += run_dataset(f'synthetic-{locations}', paths['year'], paths['month'], args.repeats)
+        finally:
+            connection.configure(connection.DB_PATH)
+
+    output = args.output or ROOT / 'benchmarks' / f"results-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {output}.")
+    if args.compare:
+        compare(report['results'], args.compare)
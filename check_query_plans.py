@@ -0,0 +1,168 @@
+import re
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+from measles_data import connection, queries
+from measles_data.cache import clear_cache
+from measles_data.models import database
+from measles_data.queries import (get_monthly_cases, get_countries, get_aggregated_cases, get_top_incidence,
+                                  get_bottom_lab_confirmed_ratio, get_cases_by_country, get_cases_by_date_range,
+                                  get_cases, get_country_info, country_map)
+from measles_data.decomposition import _stored_series
+
+# Runs EXPLAIN QUERY PLAN over every query the app issues and fails if any of them
+# scans a whole table or index, unless that table is on the workload's allow-list.
+# Queries are captured while running the same calls the pages and the ETL make,
+# against a temporary copy of the database, with the process-wide caches cleared
+# before each workload so every one issues its own queries.
+# usage: python check_query_plans.py
+
+ALL_REGIONS = ['AFR', 'AMR', 'SEAR', 'EUR', 'EMR', 'WPR']
+
+# (name, call, tables it may scan); scans are only allowed where a call reads every row by design.
+# The country map loads the whole (small) country table once per data version.
+COUNTRY_MAP = ('country',)
+WORKLOADS = [
+    ('get_monthly_cases', lambda: get_monthly_cases(backend='sql'), ('case_data',)),
+    ('get_countries', get_countries, ('country',)),
+    ('country map', country_map, COUNTRY_MAP),
+    ('top incidence ranking', get_top_incidence, ('yearly_stats',)),
+    ('lab confirmed ratio ranking', get_bottom_lab_confirmed_ratio, ('yearly_stats',)),
+    ('time series by region',
+     lambda: get_aggregated_cases('measles_total', regions=ALL_REGIONS, group_by=('date', 'region')), ()),
+    ('seasonal heatmap',
+     lambda: get_aggregated_cases('measles_total', regions=['AFR'], group_by=('year', 'month')), ()),
+    ('seasonal monthly mean',
+     lambda: get_aggregated_cases('measles_total', regions=ALL_REGIONS, group_by=('month',), agg='mean'), ()),
+    ('regional seasonal mean',
+     lambda: get_aggregated_cases('measles_total', regions=ALL_REGIONS, group_by=('region', 'month'), agg='mean'), ()),
+    ('date range across countries',
+     lambda: get_aggregated_cases('measles_total', date_range=('2019-01-01', '2019-12-31'), group_by=('iso3',),
+                                  agg='max', use_rollups=False), ()),
+    ('region filter on case data',
+     lambda: get_aggregated_cases('measles_total', regions=['EUR'], group_by=('date',), agg='max',
+                                  use_rollups=False), ()),
+    ('cases by country', lambda: get_cases_by_country('DZA'), COUNTRY_MAP),
+    ('cases by date range', lambda: get_cases_by_date_range('2012-01-01', '2012-01-31'), COUNTRY_MAP),
+    ('cases of several countries', lambda: get_cases(['DZA', 'FRA', 'IND']), COUNTRY_MAP),
+    ('cases of several countries in a date range, columnar',
+     lambda: get_cases(['DZA', 'FRA'], '2019-01-01', '2019-12-31', as_frame=True), ()),
+    ('country info', lambda: get_country_info('DZA'), COUNTRY_MAP),
+    ('stored seasonal decomposition', lambda: _stored_series('AFR', 'measles_total'), ()),
+]
+
+def _etl_workload():
+    from measles_data import etl
+    etl.load_incremental(etl.CSV_DIR / 'cases_year.csv', etl.CSV_DIR / 'cases_month.csv')
+
+def _rollup_workload():
+    # What a chunk with one changed row refreshes
+    import pandas as pd
+    from measles_data import etl
+    etl.refresh_rollups(pd.DataFrame({'iso3': ['DZA'], 'date': ['2019-01-01']}))
+
+def _region_move_workload():
+    from measles_data import etl
+    etl.refresh_rollups(regions=['AFR', 'EUR'])
+
+def _decomposition_workload():
+    from measles_data.decomposition import refresh_decompositions
+    refresh_decompositions()
+
+WORKLOADS.append(('incremental ETL', _etl_workload, ()))
+WORKLOADS.append(('rollup refresh for changed rows', _rollup_workload, ()))
+WORKLOADS.append(('rollup refresh after a region move', _region_move_workload, ()))
+# Decomposes whole series, so it reads the full region rollup and decomposition table
+WORKLOADS.append(('seasonal decomposition refresh', _decomposition_workload,
+                  ('region_month_rollup', 'seasonal_decomposition')))
+
+EXPLAINABLE = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+# Every SCAN, with or without an index: SCAN t USING [COVERING] INDEX still reads all of it
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\S+)')
+ALIAS = re.compile(r'"(\w+)" AS "(\w+)"')
+SINGLE_ROW = re.compile(r'LIMIT (1|\?)\s*$', re.IGNORECASE)
+
+def capture(call):
+    # Runs call and returns the (sql, params) of every statement it sent to SQLite
+    statements = []
+    # an instance attribute may already be installed (measles_data.instrumentation's hook)
+    previous = database.__dict__.get('execute_sql')
+    execute_sql = database.execute_sql
+
+    def recording_execute_sql(sql, params=None, *args, **kwargs):
+        statements.append((sql, tuple(params or ())))
+        return execute_sql(sql, params, *args, **kwargs)
+
+    database.execute_sql = recording_execute_sql
+    try:
+        call()
+    finally:
+        if previous is None:
+            del database.execute_sql
+        else:
+            database.execute_sql = previous
+    return statements
+
+def explain(sql, params):
+    return [row[3] for row in database.execute_sql('EXPLAIN QUERY PLAN ' + sql, params).fetchall()]
+
+def full_scans(sql, params):
+    # Tables scanned by the statement, by name; scans of subqueries and CTEs read
+    # intermediate results rather than stored rows, so they are not counted
+    if not EXPLAINABLE.match(sql) or 'sqlite_master' in sql:
+        return []
+    # Single-row probes such as .exists() stop at the first row
+    match = SINGLE_ROW.search(sql)
+    if match and (match.group(1) == '1' or params[-1] == 1):
+        return []
+    tables = set(database.get_tables())
+    aliases = {alias: table for table, alias in ALIAS.findall(sql)}
+    scans = [aliases.get(m.group(1), m.group(1)) for m in map(FULL_SCAN.match, explain(sql, params)) if m]
+    return [table for table in dict.fromkeys(scans) if table in tables]
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        # Work on a copy so the ETL workload does not touch the real database. The backup API
+        # copies what readers see, including commits still in the -wal file.
+        db_path = connection.db_path()
+        source = sqlite3.connect(connection.database_uri(db_path), uri=True)
+        copy = sqlite3.connect(Path(tmp) / db_path.name)
+        try:
+            source.backup(copy)
+        finally:
+            source.close()
+            copy.close()
+        connection.configure(Path(tmp) / db_path.name, read_only=False)
+        try:
+            for name, call, allowed in WORKLOADS:
+                # memoized lookups would otherwise hide a query from every workload but the first
+                queries._country_cache['version'] = None
+                clear_cache()
+                failed, allowed_scans = [], set()
+                for sql, params in dict.fromkeys(capture(call)):
+                    scans = full_scans(sql, params)
+                    allowed_scans.update(table for table in scans if table in allowed)
+                    unexpected = [table for table in scans if table not in allowed]
+                    if unexpected:
+                        failed.append(f"     SCAN {', '.join(unexpected)}: {sql}")
+                if failed:
+                    failures += len(failed)
+                    print(f"{'FAIL':<40} {name}")
+                    print('\n'.join(failed))
+                else:
+                    label = f"ok (scans {', '.join(sorted(allowed_scans))})" if allowed_scans else 'ok'
+                    print(f"{label:<40} {name}")
+        finally:
+            database.close()
+            connection.configure(db_path)
+    if failures:
+        print(f"{failures} queries do a full table scan.")
+        return 1
+    print("No unexpected full table scans.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+from measles_data.export import main
+
+# Exports case data to CSV or Parquet, streamed page by page (see measles_data/export.py).
+# usage: python database_export.py OUT_FILE [--iso3 CODE ...] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+#                                  [--format csv|parquet] [--page-size N]
+
+if __name__ == '__main__':
+    main()
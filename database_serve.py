@@ -0,0 +1,7 @@
+from measles_data.service import main
+
+# Serves the case data read-only over HTTP/JSON (see measles_data/service.py).
+# usage: python database_serve.py [--port N] [--address ADDR]
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+from measles_data.synthetic import main
+
+# Writes synthetic cases_month.csv / cases_year.csv for scale testing (see measles_data/synthetic.py).
+# usage: python generate_synthetic.py OUT_DIR [--locations N] [--start-year Y] [--years N]
+#                                     [--granularity month|week] [--seed S]
+
+if __name__ == '__main__':
+    main()
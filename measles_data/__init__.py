@@ -0,0 +1,17 @@
+# Data-access package for the measles/rubella dashboard.
+#   measles_data.connection  thread-safe connection pool (read-only when serving, WAL when loading)
+#   measles_data.models   Peewee models bound to the pooled database (cheap to import)
+#   measles_data.queries  pandas-returning query helpers used by the pages
+#   measles_data.cache    process-wide dataset cache shared by the pages
+#   measles_data.cube     dense float32 [country, month, metric] store (CASE_BACKEND=cube)
+#   measles_data.compact  compact-dtype monthly table: categories, nullable Int32 (CASE_BACKEND=compact)
+#   measles_data.snapshot  memory-mapped Arrow snapshot of the monthly table, written by the ETL
+#   measles_data.figures  LRU render cache for page figures (PNG bytes / plotly JSON)
+#   measles_data.animation  precomputed, downsampled frames for the animated map
+#   measles_data.decomposition  stored/memoized seasonal decompositions, refreshed by the ETL
+#   measles_data.seasonal  one-pass monthly statistics for the Seasonal Trends page
+#   measles_data.synthetic  deterministic synthetic CSVs for scale testing (generate_synthetic.py)
+#   measles_data.export   streamed CSV / Parquet export of case data (database_export.py)
+#   measles_data.service  read-only Tornado HTTP/JSON service (database_serve.py)
+#   measles_data.instrumentation  opt-in query / stage timings and Prometheus metrics (CASE_INSTRUMENT=1)
+#   measles_data.etl      CSV -> SQLite loader, run through database_create.py
@@ -0,0 +1,136 @@
+import functools
+
+import numpy as np
+
+from measles_data.cache import get_dataset, data_version
+from measles_data.instrumentation import timed
+
+# Frame engine for the Animated Global Map. Binned levels and marker sizes are
+# computed once per (case column, year range, frame step, data version) as a
+# countries x frames grid. The figure then places every country once in a base
+# trace, and each frame only carries the values that change (sizes, levels and
+# hover figures) instead of a full set of traces per level like px.scatter_geo.
+# Long ranges are downsampled to quarterly or yearly frames.
+
+LEVELS = ["0-50", "50-200", "200-1000", "1000+"]
+LEVEL_COLORS = ["#F1948A", "#E74C3C", "#C0392B", "#78281F"]
+LEVEL_EDGES = [50, 200, 1000] # upper bounds of all but the last level, right-inclusive like pd.cut
+
+SIZE_OFFSET = 20 # keeps countries with few cases visible
+SIZE_MAX = 50    # marker diameter in px for the largest value, as size_max in px.scatter_geo
+MAX_FRAMES = 60  # above this many months the animation steps by quarter, then by year
+
+FRAME_STEPS = {'month': ('M', 1), 'quarter': ('Q', 3), 'year': ('Y', 12)}
+
+def frame_step(start_year, end_year, max_frames=MAX_FRAMES):
+    # Finest step that keeps the frame count at or below max_frames
+    months = (end_year - start_year + 1) * 12
+    for step, (_, months_per_frame) in FRAME_STEPS.items():
+        if months / months_per_frame <= max_frames:
+            return step
+    return 'year'
+
+def _frame_label(period, step):
+    if step == 'month':
+        return period.strftime('%Y-%m')
+    if step == 'quarter':
+        return f"{period.year} Q{period.quarter}"
+    return str(period.year)
+
+@functools.lru_cache(maxsize=32)
+@timed()
+def _frame_grid(case_column, start_year, end_year, step, version):
+    data = get_dataset()
+    rows = data.loc[(data['year'] >= start_year) & (data['year'] <= end_year) & data[case_column].notna(),
+                    ['iso3', 'country', 'date', case_column]]
+    period = rows['date'].dt.to_period(FRAME_STEPS[step][0]).rename('period')
+
+    # Average monthly cases per frame, so levels mean the same thing at every step
+    grid = rows.groupby(['iso3', period], observed=True)[case_column].mean().unstack('period').sort_index(axis=1)
+    values = grid.to_numpy(dtype='float64', na_value=np.nan)
+    present = ~np.isnan(values)
+
+    levels = np.searchsorted(LEVEL_EDGES, np.where(present, values, 0), side='left')
+    # a few reported figures are negative corrections; they draw as the smallest marker
+    sizes = np.where(present, np.clip(values, 0, None) + SIZE_OFFSET, 0)
+    max_size = sizes.max() if sizes.size else 0
+    return {
+        'iso3': grid.index.to_list(),
+        'country': rows.groupby('iso3', observed=True)['country'].last().reindex(grid.index).to_list(),
+        'labels': [_frame_label(p, step) for p in grid.columns],
+        'values': values,
+        'levels': levels,
+        'sizes': sizes,
+        # Area sizing with the same reference px.scatter_geo uses for size_max
+        # (plotly needs a positive sizeref, even when no figure was reported)
+        'sizeref': 2.0 * max_size / SIZE_MAX ** 2 if max_size > 0 else 1.0,
+    }
+
+@timed()
+def frame_grid(case_column, start_year, end_year, step=None):
+    # Returns the precomputed grid; step=None picks one with frame_step()
+    step = step or frame_step(start_year, end_year)
+    return _frame_grid(case_column, start_year, end_year, step, data_version())
+
+def _frame_trace(go, grid, i):
+    values = grid['values'][:, i]
+    levels = grid['levels'][:, i]
+    hover = [[None if np.isnan(v) else round(float(v), 1), LEVELS[level] if not np.isnan(v) else 'No data']
+             for v, level in zip(values, levels)]
+    return go.Scattergeo(marker={'size': np.round(grid['sizes'][:, i], 1), 'color': levels}, customdata=hover)
+
+@timed()
+def build_figure(grid, disease, scope, projection, title):
+    import plotly.graph_objects as go
+
+    # None when the selected years have no figures: there is no frame to draw
+    if not grid['iso3'] or not grid['labels']:
+        return None
+
+    # Discrete colour scale over level codes 0..3
+    n = len(LEVELS)
+    colorscale = [[bound / n, color] for i, color in enumerate(LEVEL_COLORS) for bound in (i, i + 1)]
+    hovertemplate = (
+        '<b>%{hovertext}</b><br>' +
+        '<br>' +
+        f'{disease} (avg per month): %{{customdata[0]:,}}<br>' +
+        'Level: %{customdata[1]}<extra></extra>'
+    )
+
+    # Trace 0 carries the countries and styling once; frames only restyle it
+    base = _frame_trace(go, grid, 0)
+    base.update(locations=grid['iso3'], locationmode='ISO-3', hovertext=grid['country'], hovertemplate=hovertemplate,
+                showlegend=False, marker={'sizemode': 'area', 'sizeref': grid['sizeref'], 'colorscale': colorscale,
+                                          'cmin': -0.5, 'cmax': n - 0.5})
+    # Legend-only traces, one per level
+    legend = [go.Scattergeo(lon=[None], lat=[None], mode='markers', name=level, legendgroup=level,
+                            marker={'color': color, 'size': 10}, hoverinfo='skip')
+              for level, color in zip(LEVELS, LEVEL_COLORS)]
+    frames = [go.Frame(name=label, data=[_frame_trace(go, grid, i)], traces=[0])
+              for i, label in enumerate(grid['labels'])]
+
+    def animate_args(frame_names, duration):
+        return [frame_names, {'frame': {'duration': duration, 'redraw': True}, 'mode': 'immediate',
+                              'fromcurrent': True, 'transition': {'duration': duration, 'easing': 'linear'}}]
+
+    fig = go.Figure(data=[base] + legend, frames=frames)
+    fig.update_layout(
+        title=title,
+        legend_title_text='Level',
+        geo={'projection_type': projection, 'scope': scope},
+        margin={"r": 0, "t": 50, "l": 0, "b": 0},
+        updatemenus=[{
+            'type': 'buttons', 'direction': 'left', 'showactive': False,
+            'x': 0.1, 'xanchor': 'right', 'y': 0, 'yanchor': 'top', 'pad': {'r': 10, 't': 70},
+            'buttons': [
+                {'label': '&#9654;', 'method': 'animate', 'args': animate_args(None, 500)},
+                {'label': '&#9724;', 'method': 'animate', 'args': animate_args([None], 0)},
+            ],
+        }],
+        sliders=[{
+            'active': 0, 'len': 0.9, 'pad': {'b': 10, 't': 60}, 'currentvalue': {'prefix': 'Time: '},
+            'steps': [{'label': label, 'method': 'animate', 'args': animate_args([label], 0)}
+                      for label in grid['labels']],
+        }],
+    )
+    return fig
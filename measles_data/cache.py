@@ -0,0 +1,59 @@
+import os
+import threading
+
+from measles_data.connection import db_path
+from measles_data.instrumentation import timed
+from measles_data.queries import get_monthly_cases
+
+REGION_NAMES = {
+    "AFR": "African Region",
+    "AMR": "American Region",
+    "SEAR": "South-East Asian Region",
+    "EUR": "European Region",
+    "EMR": "East Mediterranean Region",
+    "WPR": "West Pacific Region"
+}
+
+_lock = threading.Lock()
+_cache = {'version': None, 'frame': None}
+
+def data_version():
+    # Changes whenever the database is written (e.g. after an ETL run). In WAL mode
+    # commits land in the -wal file until a checkpoint, so it is part of the version;
+    # an empty -wal (readers create one when they open the file) holds nothing new.
+    path = db_path()
+    version = ()
+    for file in (path, path.with_name(path.name + '-wal')):
+        if file.exists():
+            stat = os.stat(file)
+            if stat.st_size or file == path:
+                version += (stat.st_mtime_ns, stat.st_size)
+    return version
+
+@timed()
+def _build_dataset():
+    # Monthly cases plus the derived columns the pages used to add themselves
+    df = get_monthly_cases()
+    df['year'] = df['date'].dt.year
+    df['month'] = df['date'].dt.month
+    df['month_name'] = df['date'].dt.strftime('%B')
+    df['region_name'] = df['region'].map(REGION_NAMES)
+    return df
+
+def get_dataset():
+    # Returns a shallow copy of the process-wide monthly dataset.
+    # The table is loaded once per server process and reloaded when the DB file changes.
+    # The copy shares its column data with the cache: adding columns is fine, but
+    # callers must .copy() (a selection or the frame) before changing values in place.
+    version = data_version()
+    with _lock:
+        if _cache['version'] != version:
+            _cache['frame'] = _build_dataset()
+            _cache['version'] = version
+        frame = _cache['frame']
+    return frame.copy(deep=False)
+
+def clear_cache():
+    with _lock:
+        _cache['version'] = None
+        _cache['frame'] = None
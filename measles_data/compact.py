@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from measles_data.connection import pooled
+from measles_data.models import database, Country, CaseData, CASE_COLUMNS
+from measles_data.queries import _read_columns
+
+# Typed loader for the monthly table with compact dtypes:
+#   iso3 / country / region   category (codes into the 193-row country table)
+#   case counts                nullable Int32; NA where the CSV was blank (case_data.missing_mask),
+#                              so real zeros and missing figures stay distinct
+#   date                       built from case_data.month_ordinal, no string parsing
+# Same columns as get_monthly_cases(); get_monthly_cases(backend='compact') returns it.
+
+MONTH_ORDINAL_EPOCH = 1970 * 12 # month_ordinal of 1970-01, where datetime64[M] counts from
+
+def _categorical(codes, categories):
+    categories = pd.Index(categories)
+    if categories.is_unique:
+        return pd.Categorical.from_codes(codes, categories=categories)
+    return pd.Categorical(categories.to_numpy()[codes])
+
+@pooled
+def load_compact(metrics=CASE_COLUMNS, report=False):
+    countries = _read_columns(Country.select(Country.iso3, Country.country, Country.region).order_by(Country.iso3))
+    query = CaseData.select(CaseData.country_iso3, CaseData.month_ordinal, CaseData.missing_mask,
+                            *[getattr(CaseData, m) for m in metrics])
+    rows = database.execute(query).fetchall()
+    columns = list(zip(*rows)) if rows else [()] * (3 + len(metrics))
+
+    codes = pd.Index(countries['iso3']).get_indexer(list(columns[0]))
+    regions = pd.Index(sorted(countries['region'].unique()))
+    region_codes = regions.get_indexer(countries['region'])[codes]
+    ordinals = np.array(columns[1], dtype=np.int64)
+    missing = np.array(columns[2], dtype=np.int64)
+
+    frame = pd.DataFrame({
+        'iso3': _categorical(codes, countries['iso3']),
+        'country': _categorical(codes, countries['country']),
+        'region': pd.Categorical.from_codes(region_codes, categories=regions),
+        'date': (ordinals - MONTH_ORDINAL_EPOCH).astype('datetime64[M]').astype('datetime64[ns]'),
+    })
+    for k, metric in enumerate(metrics):
+        values = np.array(columns[3 + k], dtype=np.float64)
+        # the ETL sets bit k of missing_mask for CASE_COLUMNS[k], whatever subset is loaded here
+        bit = CASE_COLUMNS.index(metric)
+        frame[metric] = pd.arrays.IntegerArray(np.nan_to_num(values).astype(np.int32),
+                                               mask=(missing >> bit) & 1 == 1)
+    if report:
+        memory_report(frame)
+    return frame
+
+def missing_mask(frame, metrics=CASE_COLUMNS):
+    # Boolean [row, metric] array of the figures that were blank in the source
+    return np.column_stack([frame[m].isna().to_numpy() for m in metrics])
+
+def memory_report(frame):
+    # Prints and returns the frame's size against the same data with object keys and float64 counts
+    wide = frame.copy()
+    for column in wide.columns:
+        if isinstance(wide[column].dtype, pd.CategoricalDtype):
+            wide[column] = wide[column].astype(object)
+        elif isinstance(wide[column].dtype, pd.Int32Dtype):
+            wide[column] = wide[column].astype('float64').fillna(0)
+    before = int(wide.memory_usage(deep=True).sum())
+    after = int(frame.memory_usage(deep=True).sum())
+    print(f"Monthly cases: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB with compact dtypes "
+          f"({1 - after / before:.0%} saved).")
+    return {'before': before, 'after': after, 'saved': before - after}
@@ -0,0 +1,80 @@
+import functools
+import os
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+from playhouse.pool import PooledSqliteDatabase
+
+# Shared connection pool. Streamlit runs every session on its own thread, so each
+# thread borrows a connection from the pool and hands it back when its query helper
+# returns instead of holding one open for the life of the thread.
+# Serving processes open the file read-only (mode=ro); the ETL switches the pool to
+# read-write and keeps the file in WAL mode so pages keep reading while it commits.
+
+# Resolve the database at the repository root so pages work from any working directory
+BASE_DIR = Path(__file__).parent.parent.resolve()
+DB_PATH = Path(os.environ.get('CASE_DB_PATH', BASE_DIR / 'measles_rubella.db'))
+
+# Set CASE_DB_IMMUTABLE=1 on deployments where the database file never changes;
+# SQLite then skips locking entirely, but an ETL run is not seen until restart
+IMMUTABLE = os.environ.get('CASE_DB_IMMUTABLE') == '1'
+
+MAX_CONNECTIONS = int(os.environ.get('CASE_DB_MAX_CONNECTIONS', 32))
+STALE_TIMEOUT = 300 # seconds before an idle pooled connection is recycled
+WAIT_TIMEOUT = 30   # seconds a thread waits for a free connection before raising
+
+# Applied to every new connection
+READ_PRAGMAS = {
+    'cache_size': -16 * 1024,        # 16 MB page cache per connection
+    'mmap_size': 256 * 1024 * 1024,  # map the file instead of copying pages through read()
+}
+WRITE_PRAGMAS = dict(READ_PRAGMAS, journal_mode='wal', synchronous='normal')
+
+database = PooledSqliteDatabase(None)
+
+_lock = threading.Lock()
+_state = {'path': None, 'read_only': None}
+
+def database_uri(path, read_only=True, immutable=False):
+    params = 'mode=ro' if read_only else 'mode=rwc'
+    if read_only and immutable:
+        params += '&immutable=1'
+    return f"file:{quote(Path(path).resolve().as_posix())}?{params}"
+
+def configure(path=None, read_only=True, immutable=IMMUTABLE):
+    # (Re)points the shared pool at path (default: the current one). Connections
+    # already handed out keep working until they are returned, then get discarded.
+    with _lock:
+        path = Path(path) if path is not None else (_state['path'] or DB_PATH)
+        if not database.deferred:
+            database.close_all()
+        database.init(database_uri(path, read_only, immutable), uri=True, check_same_thread=False,
+                      max_connections=MAX_CONNECTIONS, stale_timeout=STALE_TIMEOUT, timeout=WAIT_TIMEOUT,
+                      pragmas=READ_PRAGMAS if read_only else WRITE_PRAGMAS)
+        _state['path'], _state['read_only'] = path, read_only
+
+def db_path():
+    return _state['path']
+
+def is_read_only():
+    return _state['read_only']
+
+def writable():
+    # Used by the ETL entry points before they write
+    if is_read_only():
+        configure(read_only=False)
+
+def pooled(func):
+    # Returns the calling thread's connection to the pool once the outermost helper finishes.
+    # Calls made while the thread already holds a connection (nested helpers, the ETL's
+    # transactions) leave it to the caller.
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not database.is_closed():
+            return func(*args, **kwargs)
+        with database.connection_context():
+            return func(*args, **kwargs)
+    return wrapper
+
+configure()
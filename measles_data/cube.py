@@ -0,0 +1,119 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from measles_data.connection import pooled
+from measles_data.models import Country, CaseData, CASE_COLUMNS
+from measles_data.queries import _read_columns
+
+# Dense in-memory store of case_data: a float32 array shaped
+# [n_countries, n_months, n_metrics] with index maps for iso3, date and metric,
+# and a region x country membership mask. Slices, region sums and rolling windows
+# are plain NumPy operations on it. get_monthly_cases(backend='cube') serves the
+# monthly table from here instead of SQLite.
+# Counts are whole numbers well below 2**24, so float32 holds them exactly; NULL
+# figures load as 0, as the ETL already stores them.
+
+class CaseCube:
+    def __init__(self, values, present, iso3, countries, country_regions, dates, metrics):
+        self.values = values                    # float32 [country, month, metric]; 0 where no row
+        self.present = present                  # bool [country, month]; True where case_data has a row
+        self.iso3 = list(iso3)
+        self.countries = list(countries)
+        self.country_regions = list(country_regions)
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.metrics = list(metrics)
+        self.regions = sorted(set(self.country_regions))
+
+        self.country_index = {code: i for i, code in enumerate(self.iso3)}
+        self.date_index = {date: j for j, date in enumerate(self.dates)}
+        self.metric_index = {metric: k for k, metric in enumerate(self.metrics)}
+        self.region_mask = np.array(self.regions, dtype=object)[:, None] == np.array(self.country_regions, dtype=object)[None, :]
+        self._region_weights = self.region_mask.astype(np.float32)
+
+    @classmethod
+    @pooled
+    def from_database(cls, metrics=CASE_COLUMNS):
+        countries = _read_columns(Country.select(Country.iso3, Country.country, Country.region)
+                                  .order_by(Country.iso3))
+        rows = _read_columns(CaseData.select(CaseData.country_iso3.alias('iso3'), CaseData.date,
+                                             *[getattr(CaseData, m) for m in metrics]))
+        dates = np.unique(rows['date'].to_numpy())
+        country_idx = pd.Index(countries['iso3']).get_indexer(rows['iso3'])
+        date_idx = np.searchsorted(dates, rows['date'].to_numpy())
+
+        values = np.zeros((len(countries), len(dates), len(metrics)), dtype=np.float32)
+        values[country_idx, date_idx] = np.nan_to_num(rows[list(metrics)].to_numpy(dtype=np.float32))
+        present = np.zeros((len(countries), len(dates)), dtype=bool)
+        present[country_idx, date_idx] = True
+        return cls(values, present, countries['iso3'], countries['country'], countries['region'], dates, metrics)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.present.nbytes + self.region_mask.nbytes
+
+    def _date_slice(self, start=None, end=None):
+        # start/end are inclusive dates (anything pd.Timestamp accepts)
+        lo = 0 if start is None else np.searchsorted(self.dates, pd.Timestamp(start).to_datetime64(), side='left')
+        hi = len(self.dates) if end is None else np.searchsorted(self.dates, pd.Timestamp(end).to_datetime64(), side='right')
+        return slice(lo, hi)
+
+    def slice(self, metric=None, iso3=None, start=None, end=None):
+        # Part of the cube; metric and iso3 may be a single key or a list of keys
+        # (a single key drops that axis; lists keep it)
+        view = self.values[:, self._date_slice(start, end)]
+        if iso3 is not None:
+            view = view[self.country_index[iso3] if isinstance(iso3, str) else [self.country_index[c] for c in iso3]]
+        if metric is not None:
+            view = view[..., self.metric_index[metric] if isinstance(metric, str) else [self.metric_index[m] for m in metric]]
+        return view
+
+    def dates_between(self, start=None, end=None):
+        return self.dates[self._date_slice(start, end)]
+
+    def sum_by_region(self, metric, start=None, end=None):
+        # [region, month] totals of one metric, regions in self.regions order
+        values = self.values[:, self._date_slice(start, end), self.metric_index[metric]]
+        return self._region_weights @ values
+
+    def rolling(self, metric, window, iso3=None, how='mean'):
+        # Trailing window over months for every country (or one); NaN until the window is full,
+        # so all NaN when the window is longer than the series
+        if window <= 0:
+            raise ValueError(f"Rolling window must be a positive number of months, got {window}.")
+        series = self.slice(metric, iso3)
+        totals = np.full(series.shape, np.nan)
+        if window > series.shape[-1]:
+            return totals
+        cumulative = np.cumsum(series, axis=-1, dtype=np.float64)
+        totals[..., window - 1] = cumulative[..., window - 1]
+        totals[..., window:] = cumulative[..., window:] - cumulative[..., :-window]
+        return totals / window if how == 'mean' else totals
+
+    def to_frame(self):
+        # Same columns and dtypes as get_monthly_cases(), one row per stored (country, month)
+        country_idx, date_idx = np.nonzero(self.present)
+        frame = pd.DataFrame({
+            'iso3': np.array(self.iso3, dtype=object)[country_idx],
+            'country': np.array(self.countries, dtype=object)[country_idx],
+            'region': np.array(self.country_regions, dtype=object)[country_idx],
+            'date': self.dates[date_idx],
+        })
+        values = self.values[country_idx, date_idx].astype(np.float64)
+        for k, metric in enumerate(self.metrics):
+            frame[metric] = values[:, k]
+        return frame
+
+_lock = threading.Lock()
+_cache = {'version': None, 'cube': None}
+
+def get_cube():
+    # Process-wide cube, rebuilt when the database changes
+    from measles_data.cache import data_version
+    version = data_version()
+    with _lock:
+        if _cache['version'] != version:
+            _cache['cube'] = CaseCube.from_database()
+            _cache['version'] = version
+        return _cache['cube']
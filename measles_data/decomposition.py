@@ -0,0 +1,173 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+from measles_data.connection import pooled
+from measles_data.instrumentation import timed
+from measles_data.models import database, RegionMonthRollup, SeasonalDecomposition, CASE_COLUMNS
+from measles_data.queries import _read_columns, get_aggregated_cases
+
+# Seasonal decomposition service. The ETL decomposes the monthly totals of every
+# region and of the whole world ('ALL'), for every case column, in one vectorized
+# pass over a (months, series) array and stores the result in seasonal_decomposition.
+# When a load only appends months, the stored trend is kept and only its last six
+# months plus the new ones are recomputed. Pages read a stored series when their
+# selection is a single region or all regions, and decompose any other selection on
+# demand; both are memoized per data version.
+# The model is the page's: multiplicative, period 12, on cases + 1 so empty months stay defined.
+
+PERIOD = 12
+REGIONS = ('AFR', 'AMR', 'EMR', 'EUR', 'SEAR', 'WPR')
+GLOBAL = 'ALL'
+COMPONENTS = ['observed', 'trend', 'seasonal', 'resid']
+
+# Centred 2x12 moving average, the filter statsmodels uses for an even period
+_FILTER = np.r_[0.5, np.ones(PERIOD - 1), 0.5] / PERIOD
+_HALF = PERIOD // 2
+
+def _trend(observed):
+    # Trend of each column; NaN for the first and last six months
+    from statsmodels.tsa.filters.filtertools import convolution_filter
+    return np.asarray(convolution_filter(observed, _FILTER, nsides=2))
+
+def _seasonal_resid(observed, trend):
+    # Same steps as statsmodels' seasonal_decompose once the trend is known
+    detrended = observed / trend
+    period_averages = np.array([np.nanmean(detrended[i::PERIOD], axis=0) for i in range(PERIOD)])
+    period_averages /= period_averages.mean(axis=0)
+    seasonal = np.tile(period_averages.T, len(observed) // PERIOD + 1).T[:len(observed)]
+    return seasonal, observed / seasonal / trend
+
+def decompose(observed):
+    # observed: (months, series) array over consecutive months, at least two full years
+    if len(observed) < 2 * PERIOD:
+        raise ValueError(f"Seasonal decomposition needs at least {2 * PERIOD} months, got {len(observed)}.")
+    trend = _trend(observed)
+    seasonal, resid = _seasonal_resid(observed, trend)
+    return {'observed': observed, 'trend': trend, 'seasonal': seasonal, 'resid': resid}
+
+def extend(previous, observed):
+    # Decomposition of observed, whose first months are the ones decomposed in previous.
+    # Trend values more than six months from the old end are unchanged, so only the
+    # tail is refiltered; seasonal factors and residuals are recomputed as vector ops.
+    n = len(previous['observed'])
+    if n < 2 * PERIOD:
+        return decompose(observed)
+    start = n - _HALF
+    trend = np.concatenate([previous['trend'][:start], _trend(observed[start - _HALF:])[_HALF:]])
+    seasonal, resid = _seasonal_resid(observed, trend)
+    return {'observed': observed, 'trend': trend, 'seasonal': seasonal, 'resid': resid}
+
+def _calendar(dates):
+    # Every month from the first to the last date, so period 12 always means one year
+    return pd.date_range(dates.min(), dates.max(), freq='MS', name='date')
+
+def monthly_totals(metrics=CASE_COLUMNS):
+    # Monthly totals from the region rollup as a frame with (series, metric) columns;
+    # months with no reports in a region count as zero cases
+    model = RegionMonthRollup
+    rows = _read_columns(model.select(model.region, model.date, *[getattr(model, m) for m in metrics]))
+    by_region = rows.set_index(['date', 'region'])[list(metrics)].unstack('region')
+    by_region = by_region.reindex(_calendar(by_region.index)).fillna(0)
+    frames = {region: by_region.xs(region, axis=1, level='region').reindex(columns=metrics, fill_value=0)
+              for region in REGIONS if region in by_region.columns.get_level_values('region')}
+    frames[GLOBAL] = sum(frames.values())
+    return pd.concat(frames, axis=1, names=['series', 'metric'])
+
+def _stored(columns):
+    # Stored components as (months, series) arrays in the order of columns, with their dates
+    model = SeasonalDecomposition
+    rows = _read_columns(model.select(model.series, model.metric, model.date,
+                                      *[getattr(model, c) for c in COMPONENTS]))
+    if rows.empty:
+        return None, None
+    wide = rows.set_index(['date', 'series', 'metric']).unstack(['series', 'metric'])
+    if not all(column in wide['observed'].columns for column in columns):
+        return None, None
+    return wide.index, {c: wide[c][columns].to_numpy() for c in COMPONENTS}
+
+def _write(dates, columns, components):
+    n_dates, n_columns = len(dates), len(columns)
+    long = pd.DataFrame({
+        'series': np.tile(columns.get_level_values('series'), n_dates),
+        'metric': np.tile(columns.get_level_values('metric'), n_dates),
+        'date': np.repeat(dates.strftime('%Y-%m-%d'), n_columns),
+        **{c: components[c].ravel() for c in COMPONENTS},
+    })
+    long = long.astype(object).where(long.notna(), None)
+    fields = ['series', 'metric', 'date'] + COMPONENTS
+    with database.atomic():
+        SeasonalDecomposition.delete().execute()
+        database.cursor().executemany(
+            f"INSERT INTO {SeasonalDecomposition._meta.table_name} ({', '.join(fields)}) "
+            f"VALUES ({', '.join('?' * len(fields))})",
+            long[fields].itertuples(index=False, name=None))
+
+def refresh_decompositions():
+    # Brings seasonal_decomposition up to date with the region rollup after a load.
+    # Returns 'incremental' when months were only appended, 'full' when stored months
+    # changed (or nothing was stored yet), 'unchanged' otherwise and 'skipped' when
+    # there are no months or fewer than two years of them to decompose.
+    database.create_tables([SeasonalDecomposition])
+    if not RegionMonthRollup.select().exists():
+        SeasonalDecomposition.delete().execute()
+        return 'skipped'
+    totals = monthly_totals()
+    dates, columns = totals.index, totals.columns
+    if len(dates) < 2 * PERIOD:
+        # nothing stored, so lookups go to the on-demand path, which reports the short series
+        SeasonalDecomposition.delete().execute()
+        return 'skipped'
+    observed = totals.to_numpy() + 1
+
+    stored_dates, previous = _stored(columns)
+    n = 0 if stored_dates is None else len(stored_dates)
+    if (n and n <= len(dates) and stored_dates.equals(dates[:n])
+            and np.allclose(previous['observed'], observed[:n])):
+        if n == len(dates):
+            return 'unchanged'
+        components, mode = extend(previous, observed), 'incremental'
+    else:
+        components, mode = decompose(observed), 'full'
+    _write(dates, columns, components)
+    return mode
+
+@pooled
+def _stored_series(series, metric):
+    model = SeasonalDecomposition
+    if not model.table_exists():
+        return pd.DataFrame()
+    query = (model
+             .select(model.date, *[getattr(model, c) for c in COMPONENTS])
+             .where((model.series == series) & (model.metric == metric))
+             .order_by(model.date))
+    return _read_columns(query).set_index('date')
+
+@timed()
+def _decompose_selection(metric, regions):
+    sums = get_aggregated_cases(metric, regions=list(regions), group_by=('date',)).set_index('date')[metric]
+    observed = sums.reindex(_calendar(sums.index), fill_value=0) + 1
+    components = decompose(observed.to_numpy()[:, None])
+    return pd.DataFrame({c: components[c][:, 0] for c in COMPONENTS}, index=observed.index)
+
+@functools.lru_cache(maxsize=128)
+def _decomposition(metric, regions, version):
+    if regions == REGIONS:
+        series = GLOBAL
+    elif len(regions) == 1:
+        series = regions[0]
+    else:
+        series = None
+    if series is not None:
+        stored = _stored_series(series, metric)
+        if not stored.empty:
+            return stored
+    return _decompose_selection(metric, regions)
+
+@timed()
+def get_decomposition(metric, regions):
+    # Decomposition of the summed monthly cases of regions (codes), indexed by date,
+    # with observed / trend / seasonal / resid columns
+    from measles_data.cache import data_version
+    return _decomposition(metric, tuple(sorted(regions)), data_version()).copy(deep=False)
@@ -0,0 +1,440 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import peewee
+from peewee import fn, SQL
+from playhouse.migrate import SqliteMigrator, migrate
+
+from measles_data import connection
+from measles_data.decomposition import refresh_decompositions
+from measles_data.snapshot import bump_generation, write_snapshot
+from measles_data.models import (database, BASE_DIR, Country, CaseData, YearlyStats, LoadState, RegionMonthRollup,
+                                 CountryYearRollup, CASE_COLUMNS, YEARLY_COLUMNS, MODELS)
+
+# Incremental ETL: upserts only the (country, month) rows that are new or whose
+# figures changed since the last run, so WHO corrections land in the database.
+# The CSVs are streamed in chunks, so memory stays bounded by the chunk size.
+# --bulk does a full rebuild instead, with journaling off and indexes built after loading.
+# --dir loads every monthly/yearly CSV found under CASE_CSV_DIR (which must be set), parsing files in parallel.
+# Every run ends by bringing the stored seasonal decompositions up to date and
+# writing the Arrow snapshot the pages load from (see measles_data.snapshot).
+# usage: python database_create.py [--bulk | --dir [--workers N]] [--chunksize N]
+
+# Determine CSV locations
+CSV_DIR = Path(os.environ.get('CASE_CSV_DIR', BASE_DIR))
+
+region_mapping = {
+    'AFRO': 'AFR', 'EURO': 'EUR', 'WPRO': 'WPR', 'AMRO': 'AMR',
+    'EMRO': 'EMR', 'SEARO': 'SEAR', 'AFR': 'AFR', 'EUR': 'EUR',
+    'WPR': 'WPR', 'AMR': 'AMR', 'EMR': 'EMR', 'SEAR': 'SEAR'
+}
+
+REGION_CODES = sorted(set(region_mapping.values()))
+
+case_columns = CASE_COLUMNS
+
+DEFAULT_CHUNKSIZE = 10000
+
+def prepare_countries(df):
+    # Unique iso3/country/region combinations with standardized regions
+    countries_df = df[['iso3', 'country', 'region']].drop_duplicates().copy()
+    countries_df['region'] = countries_df['region'].map(region_mapping)
+    countries_df = countries_df.dropna(subset=['country'])
+    return countries_df.drop_duplicates(subset=['iso3'])
+
+def missing_bits(values):
+    # Bitmask per row of which case columns are missing (bit k for case_columns[k])
+    return (np.isnan(values) * (1 << np.arange(values.shape[1]))).sum(axis=1).astype(np.int64)
+
+def prepare_case_data(df_month):
+    # One row per (iso3, month) with 'YYYY-MM-DD' dates and NaN case counts set to 0;
+    # missing_mask keeps which counts were blank, month_ordinal the month as year * 12 + month - 1
+    case_data_df = df_month[['iso3'] + case_columns].copy()
+    case_data_df.insert(1, 'date', pd.to_datetime(dict(year=df_month['year'], month=df_month['month'], day=1)).dt.strftime('%Y-%m-%d'))
+    case_data_df['missing_mask'] = missing_bits(case_data_df[case_columns].to_numpy(dtype='float64'))
+    case_data_df['month_ordinal'] = (df_month['year'] * 12 + df_month['month'] - 1).astype(np.int64)
+    case_data_df[case_columns] = case_data_df[case_columns].fillna(0).astype('float64')
+    return case_data_df
+
+def prepare_yearly(df_year):
+    # One row per (iso3, year); SQLite stores the remaining NaNs as NULL
+    return df_year[['iso3'] + YEARLY_COLUMNS].drop_duplicates(subset=['iso3', 'year'], keep='last')
+
+def hash_rows(case_data_df):
+    # Vectorized 64-bit content hash of the case figures, stored as a signed SQLite integer
+    hashes = pd.util.hash_pandas_object(case_data_df[case_columns + ['missing_mask']].astype('float64'), index=False)
+    return hashes.to_numpy().view(np.int64)
+
+def iter_csv_chunks(path, chunksize=DEFAULT_CHUNKSIZE, usecols=None):
+    # Streams a CSV as DataFrames of at most chunksize rows
+    with pd.read_csv(path, chunksize=chunksize, usecols=usecols) as reader:
+        yield from reader
+
+def _upsert_sql(model, fields, conflict_fields, update_fields):
+    # INSERT ... ON CONFLICT DO UPDATE statement for executemany
+    columns = ', '.join(f'"{f.column_name}"' for f in fields)
+    placeholders = ', '.join('?' for _ in fields)
+    target = ', '.join(f'"{f.column_name}"' for f in conflict_fields)
+    updates = ', '.join(f'"{f.column_name}" = excluded."{f.column_name}"' for f in update_fields)
+    return (f'INSERT INTO "{model._meta.table_name}" ({columns}) VALUES ({placeholders}) '
+            f'ON CONFLICT ({target}) DO UPDATE SET {updates}')
+
+CASE_FIELDS = ([CaseData.country_iso3, CaseData.date] + [getattr(CaseData, c) for c in case_columns] +
+               [CaseData.month_ordinal, CaseData.missing_mask])
+CASE_ROW_COLUMNS = ['iso3', 'date'] + case_columns + ['month_ordinal', 'missing_mask']
+COUNTRY_UPSERT = _upsert_sql(Country, [Country.iso3, Country.country, Country.region],
+                             [Country.iso3], [Country.country, Country.region])
+CASE_UPSERT = _upsert_sql(CaseData, CASE_FIELDS, CASE_FIELDS[:2], CASE_FIELDS[2:])
+CASE_INSERT = (f'INSERT INTO "{CaseData._meta.table_name}" ({", ".join(f.column_name for f in CASE_FIELDS)}) '
+               f'VALUES ({", ".join("?" for _ in CASE_FIELDS)})')
+STATE_INSERT = f'INSERT INTO "{LoadState._meta.table_name}" (country_iso3, date, row_hash) VALUES (?, ?, ?)'
+YEARLY_FIELDS = [YearlyStats.country_iso3] + [getattr(YearlyStats, c) for c in YEARLY_COLUMNS]
+YEARLY_UPSERT = _upsert_sql(YearlyStats, YEARLY_FIELDS, [YearlyStats.country_iso3, YearlyStats.year], YEARLY_FIELDS[2:])
+STATE_UPSERT = _upsert_sql(LoadState, [LoadState.country_iso3, LoadState.date, LoadState.row_hash],
+                           [LoadState.country_iso3, LoadState.date], [LoadState.row_hash])
+
+def _rows(df, columns):
+    # Plain Python tuples for executemany, built column-wise
+    return zip(*(df[c].tolist() for c in columns))
+
+def upsert_countries(countries_df):
+    # A country moving to another region changes the totals of both, so their rollup rows are recomputed
+    stored = dict(Country
+                  .select(Country.iso3, Country.region)
+                  .where(Country.iso3.in_(countries_df['iso3'].tolist()))
+                  .tuples())
+    moved = set()
+    for iso3, region in zip(countries_df['iso3'], countries_df['region']):
+        previous = stored.get(iso3, region)
+        if previous != region and not (pd.isna(previous) and pd.isna(region)):
+            moved.update(r for r in (previous, region) if pd.notna(r))
+    database.cursor().executemany(COUNTRY_UPSERT, _rows(countries_df, ['iso3', 'country', 'region']))
+    if moved:
+        refresh_rollups(regions=sorted(moved))
+
+def upsert_case_data(case_data_df):
+    # Inserts new rows and overwrites changed ones
+    database.cursor().executemany(CASE_UPSERT, _rows(case_data_df, CASE_ROW_COLUMNS))
+
+def upsert_yearly(yearly_df):
+    database.cursor().executemany(YEARLY_UPSERT, _rows(yearly_df, ['iso3'] + YEARLY_COLUMNS))
+
+def record_hashes(case_data_df):
+    database.cursor().executemany(STATE_UPSERT, _rows(case_data_df, ['iso3', 'date', 'row_hash']))
+
+def _refresh_rollup(model, key_fields, query):
+    # Upserts the grouped sums selected by query into a rollup table
+    metric_fields = [model.row_count] + [getattr(model, c) for c in case_columns]
+    (model.insert_from(query, key_fields + metric_fields)
+     .on_conflict(conflict_target=key_fields, preserve=metric_fields)
+     .execute())
+
+def refresh_rollups(case_data_df=None, regions=None):
+    # Recomputes the region x month and country x year rollup rows touched by the
+    # (iso3, date) rows of case_data_df, or the region x month rows of regions, or
+    # rebuilds both tables when neither is given. Rows in scope are deleted first,
+    # so groups left without any case rows disappear.
+    sums = [fn.COUNT(SQL('*'))] + [fn.SUM(getattr(CaseData, c)) for c in case_columns]
+    year = fn.strftime('%Y', CaseData.date).cast('INTEGER')
+    region_query = (CaseData
+                    .select(Country.region, CaseData.date, *sums)
+                    .join(Country)
+                    .group_by(Country.region, CaseData.date))
+    country_query = (CaseData
+                     .select(CaseData.country_iso3, year, *sums)
+                     .group_by(CaseData.country_iso3, year))
+
+    if regions is not None:
+        if not regions:
+            return
+        RegionMonthRollup.delete().where(RegionMonthRollup.region.in_(regions)).execute()
+        region_query = region_query.where(Country.region.in_(regions))
+        country_query = None
+    elif case_data_df is None:
+        RegionMonthRollup.delete().execute()
+        CountryYearRollup.delete().execute()
+    else:
+        if case_data_df.empty:
+            return
+        dates = case_data_df['date'].unique().tolist()
+        iso3_codes = case_data_df['iso3'].unique().tolist()
+        years = sorted({int(d[:4]) for d in dates})
+        # the region filter lets the delete use the (region, date) primary key
+        (RegionMonthRollup.delete()
+         .where(RegionMonthRollup.region.in_(REGION_CODES) & RegionMonthRollup.date.in_(dates))
+         .execute())
+        (CountryYearRollup.delete()
+         .where(CountryYearRollup.country_iso3.in_(iso3_codes) & CountryYearRollup.year.in_(years))
+         .execute())
+        region_query = region_query.where(CaseData.date.in_(dates))
+        country_query = country_query.where(CaseData.country_iso3.in_(iso3_codes) & year.in_(years))
+
+    _refresh_rollup(RegionMonthRollup, [RegionMonthRollup.region, RegionMonthRollup.date], region_query)
+    if country_query is not None:
+        _refresh_rollup(CountryYearRollup, [CountryYearRollup.country_iso3, CountryYearRollup.year], country_query)
+
+def migrate_case_data():
+    # Adds month_ordinal and missing_mask to databases created before they existed.
+    # Blank counts were already stored as 0 there, so missing_mask starts at 0; the
+    # next incremental load rewrites every row (their hashes now cover the mask).
+    table = CaseData._meta.table_name
+    columns = {column.name for column in database.get_columns(table)}
+    migrator = SqliteMigrator(database)
+    operations = [migrator.add_column(table, field.column_name, field)
+                  for field in (CaseData.month_ordinal, CaseData.missing_mask) if field.column_name not in columns]
+    if operations:
+        migrate(*operations)
+        (CaseData
+         .update(month_ordinal=fn.strftime('%Y', CaseData.date).cast('INTEGER') * 12 +
+                 fn.strftime('%m', CaseData.date).cast('INTEGER') - 1)
+         .execute())
+
+def backfill_load_state(chunksize=DEFAULT_CHUNKSIZE):
+    # Hashes rows loaded before load_state existed (e.g. by database_create.py), one chunk of ids at a time
+    last_id = 0
+    while True:
+        query = (CaseData
+                 .select(CaseData.id, CaseData.country_iso3, CaseData.date, *[getattr(CaseData, c) for c in case_columns],
+                         CaseData.missing_mask)
+                 .join(LoadState, peewee.JOIN.LEFT_OUTER,
+                       on=((LoadState.country_iso3 == CaseData.country_iso3) & (LoadState.date == CaseData.date)))
+                 .where(LoadState.row_hash.is_null() & (CaseData.id > last_id))
+                 .order_by(CaseData.id)
+                 .limit(chunksize))
+        rows = database.execute(query).fetchall()
+        if not rows:
+            return
+        chunk = pd.DataFrame(rows, columns=['id', 'iso3', 'date'] + case_columns + ['missing_mask'])
+        chunk[case_columns] = chunk[case_columns].fillna(0)
+        chunk['row_hash'] = hash_rows(chunk)
+        record_hashes(chunk)
+        last_id = int(chunk['id'].iloc[-1])
+
+def _stored_hashes(case_data_df):
+    # (iso3, date) -> hash for the rows of one chunk
+    query = (LoadState
+             .select(LoadState.country_iso3, LoadState.date, LoadState.row_hash)
+             .where(LoadState.country_iso3.in_(case_data_df['iso3'].unique().tolist()) &
+                    LoadState.date.in_(case_data_df['date'].unique().tolist())))
+    return {(iso3, date): row_hash for iso3, date, row_hash in database.execute(query)}
+
+def load_case_chunk(case_data_df):
+    # Upserts the new and changed rows of one prepared chunk and returns its counts
+    case_data_df = case_data_df.drop_duplicates(subset=['iso3', 'date'], keep='last')
+    if 'row_hash' not in case_data_df:
+        case_data_df['row_hash'] = hash_rows(case_data_df)
+
+    stored = _stored_hashes(case_data_df)
+    keys = zip(case_data_df['iso3'], case_data_df['date'])
+    previous = pd.Series([stored.get(key) for key in keys], index=case_data_df.index, dtype='Int64')
+    is_new = previous.isna().to_numpy()
+    is_changed = ~is_new & (previous.to_numpy(dtype=np.int64, na_value=0) != case_data_df['row_hash'].to_numpy())
+
+    changed = case_data_df[is_new | is_changed]
+    upsert_case_data(changed)
+    record_hashes(changed)
+    refresh_rollups(changed)
+    return {
+        'inserted': int(is_new.sum()),
+        'updated': int(is_changed.sum()),
+        'unchanged': int(len(case_data_df) - is_new.sum() - is_changed.sum()),
+    }
+
+def load_incremental(year_path, month_path, chunksize=DEFAULT_CHUNKSIZE):
+    # Streams both CSVs and returns counts of inserted, updated and unchanged case rows
+    connection.writable()
+    database.create_tables(MODELS)
+    migrate_case_data()
+    bump_generation()
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    with database.atomic():
+        backfill_load_state(chunksize)
+        if not RegionMonthRollup.select().exists():
+            refresh_rollups()
+        for chunk in iter_csv_chunks(year_path, chunksize):
+            upsert_countries(prepare_countries(chunk))
+            upsert_yearly(prepare_yearly(chunk))
+        for chunk in iter_csv_chunks(month_path, chunksize):
+            upsert_countries(prepare_countries(chunk))
+            for key, value in load_case_chunk(prepare_case_data(chunk)).items():
+                counts[key] += value
+    return counts
+
+# Directories --dir never descends into (besides hidden ones such as .venv or .git)
+SKIPPED_DIRS = {'__pycache__', 'site-packages', 'node_modules', 'venv', 'env'}
+
+def csv_kind(path):
+    # 'month' or 'year' depending on the CSV header, None for unrelated or unreadable files
+    try:
+        columns = set(pd.read_csv(path, nrows=0).columns)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError):
+        return None
+    if not {'iso3', 'country', 'region', 'year'} <= columns:
+        return None
+    if {'month'} | set(case_columns) <= columns:
+        return 'month'
+    if 'total_population' in columns:
+        return 'year'
+    return None
+
+def find_csv_files(csv_dir):
+    # Every monthly and yearly extract under csv_dir, searched recursively
+    # (hidden directories and virtualenv / package directories are left out)
+    paths = []
+    for root, dirs, names in os.walk(csv_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in SKIPPED_DIRS]
+        paths.extend(Path(root) / name for name in names if name.endswith('.csv'))
+    files = {'month': [], 'year': []}
+    for path in sorted(paths):
+        kind = csv_kind(path)
+        if kind:
+            files[kind].append(path)
+        else:
+            print(f"Skipping {path}: not a monthly or yearly case extract.")
+    return files
+
+def parse_csv_file(path, kind, chunksize=DEFAULT_CHUNKSIZE):
+    # Runs in a worker process: normalizes one file and returns its countries, hashed case chunks and yearly rows
+    countries, cases, yearly = [], [], []
+    for chunk in iter_csv_chunks(path, chunksize):
+        countries.append(prepare_countries(chunk))
+        if kind == 'month':
+            case_data_df = prepare_case_data(chunk).drop_duplicates(subset=['iso3', 'date'], keep='last')
+            case_data_df['row_hash'] = hash_rows(case_data_df)
+            cases.append(case_data_df)
+        else:
+            yearly.append(prepare_yearly(chunk))
+    return path, countries, cases, yearly
+
+def parse_in_order(executor, paths, kind, chunksize, window):
+    # Yields parse_csv_file results in path order, with at most window files parsed ahead
+    # of the caller, so overlapping files resolve the same way on every run and memory
+    # stays bounded by the window rather than the directory
+    pending = deque()
+    for path in paths:
+        pending.append(executor.submit(parse_csv_file, path, kind, chunksize))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def load_directory(csv_dir, workers=None, chunksize=DEFAULT_CHUNKSIZE):
+    # Parses every extract under csv_dir in a process pool; this process is the only
+    # writer (SQLite allows one) and commits each file's batches in sorted path order,
+    # so the last file wins where extracts overlap
+    files = find_csv_files(csv_dir)
+    workers = workers or os.cpu_count() or 1
+    connection.writable()
+    database.create_tables(MODELS)
+    migrate_case_data()
+    bump_generation()
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    with database.atomic():
+        backfill_load_state(chunksize)
+        if not RegionMonthRollup.select().exists():
+            refresh_rollups()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Yearly files first so the month extracts' country names win, as in load_incremental
+        for kind in ('year', 'month'):
+            for path, countries, cases, yearly in parse_in_order(executor, files[kind], kind, chunksize, 2 * workers):
+                with database.atomic():
+                    for countries_df in countries:
+                        upsert_countries(countries_df)
+                    for yearly_df in yearly:
+                        upsert_yearly(yearly_df)
+                    for case_data_df in cases:
+                        for key, value in load_case_chunk(case_data_df).items():
+                            counts[key] += value
+                # drop this file's frames before waiting on the next one
+                del countries, cases, yearly
+                print(f"Loaded {path}.")
+    return counts
+
+def _pragma(name, value=None):
+    if value is None:
+        return database.execute_sql(f'PRAGMA {name}').fetchone()[0]
+    database.execute_sql(f'PRAGMA {name} = {value}')
+
+def load_bulk(year_path, month_path, chunksize=DEFAULT_CHUNKSIZE):
+    # Full rebuild: empties the tables and reloads them with journaling and syncing off,
+    # plain executemany inserts, and the case_data indexes dropped until the end.
+    # A crash mid-load leaves the database unusable, so only use it for rebuilds that can be rerun.
+    connection.writable()
+    database.create_tables(MODELS)
+    migrate_case_data()
+    bump_generation()
+    journal_mode, synchronous = _pragma('journal_mode'), _pragma('synchronous')
+    rows = 0
+    try:
+        _pragma('journal_mode', 'OFF')
+        _pragma('synchronous', 'OFF')
+        with database.atomic():
+            for model in (LoadState, YearlyStats, CaseData, Country):
+                model.delete().execute()
+            CaseData._schema.drop_indexes(safe=True)
+
+            for chunk in iter_csv_chunks(year_path, chunksize):
+                upsert_countries(prepare_countries(chunk))
+                upsert_yearly(prepare_yearly(chunk))
+            for chunk in iter_csv_chunks(month_path, chunksize):
+                upsert_countries(prepare_countries(chunk))
+                case_data_df = prepare_case_data(chunk).drop_duplicates(subset=['iso3', 'date'], keep='last')
+                case_data_df['row_hash'] = hash_rows(case_data_df)
+                cursor = database.cursor()
+                cursor.executemany(CASE_INSERT, _rows(case_data_df, CASE_ROW_COLUMNS))
+                cursor.executemany(STATE_INSERT, _rows(case_data_df, ['iso3', 'date', 'row_hash']))
+                rows += len(case_data_df)
+
+            CaseData._schema.create_indexes(safe=True)
+            refresh_rollups()
+        database.execute_sql('ANALYZE')
+    finally:
+        _pragma('synchronous', synchronous)
+        _pragma('journal_mode', journal_mode)
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load WHO measles/rubella CSVs into the SQLite database.")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="CSV rows parsed and written per batch.")
+    parser.add_argument('--bulk', action='store_true',
+                        help="Rebuild all tables from scratch using the fast bulk-load path.")
+    parser.add_argument('--dir', action='store_true',
+                        help="Load every monthly/yearly CSV found under CASE_CSV_DIR.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Parser processes for --dir (default: one per CPU).")
+    args = parser.parse_args(argv)
+    if args.bulk and args.dir:
+        parser.error("--bulk and --dir cannot be combined.")
+    if args.dir and 'CASE_CSV_DIR' not in os.environ:
+        # otherwise it would search the whole project directory
+        parser.error("--dir needs CASE_CSV_DIR set to the directory of extracts.")
+
+    year_path, month_path = CSV_DIR / 'cases_year.csv', CSV_DIR / 'cases_month.csv'
+    # Only the load itself is timed, so bulk and incremental rates compare directly
+    start = time.perf_counter()
+    if args.bulk:
+        rows = load_bulk(year_path, month_path, args.chunksize)
+        elapsed = time.perf_counter() - start
+        print(f"Case data: {rows} rows bulk loaded.")
+    else:
+        if args.dir:
+            counts = load_directory(CSV_DIR, args.workers, args.chunksize)
+        else:
+            counts = load_incremental(year_path, month_path, args.chunksize)
+        elapsed = time.perf_counter() - start
+        rows = sum(counts.values())
+        print(f"Case data: {counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged.")
+    print(f"Loaded {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s).")
+    print(f"Seasonal decompositions: {refresh_decompositions()}.")
+    path, snapshot_rows = write_snapshot()
+    print(f"Snapshot: {snapshot_rows} rows written to {path.name}.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import csv
+from pathlib import Path
+
+from measles_data.queries import iter_case_pages, PAGE_SIZE
+
+# CSV / Parquet export of case data, written page by page from the streaming
+# iterators in measles_data.queries, so any date range or number of locations
+# exports in memory bounded by the page size.
+# usage: python database_export.py OUT_FILE [--iso3 CODE ...] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+#                                  [--format csv|parquet] [--page-size N]
+
+FORMATS = ('csv', 'parquet')
+
+def _write_csv(path, pages):
+    rows = 0
+    with open(path, 'w', newline='') as out:
+        writer = csv.writer(out)
+        for page in pages:
+            if not rows:
+                writer.writerow(page[0]._fields)
+            writer.writerows(page)
+            rows += len(page)
+    return rows
+
+def _write_parquet(path, pages):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows, writer = 0, None
+    try:
+        for page in pages:
+            columns = dict(zip(page[0]._fields, zip(*page)))
+            columns['date'] = pa.array(columns['date'], pa.string()).cast(pa.date32())
+            table = pa.table({name: values if name == 'date' else list(values) for name, values in columns.items()})
+            if writer is None:
+                writer = pq.ParquetWriter(str(path), table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(page)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def export_cases(path, iso3_codes=None, start_date=None, end_date=None, format=None, page_size=PAGE_SIZE):
+    # Writes the selected case rows (ordered by date, iso3) to path; format defaults to the suffix.
+    # Returns the number of rows written (nothing is written when there are none).
+    path = Path(path)
+    format = format or path.suffix.lstrip('.').lower()
+    if format not in FORMATS:
+        raise ValueError(f"unknown export format {format!r}; use one of {', '.join(FORMATS)}")
+    pages = iter_case_pages(iso3_codes, start_date, end_date, page_size)
+    tmp_path = path.with_name(path.name + '.tmp')
+    rows = (_write_csv if format == 'csv' else _write_parquet)(tmp_path, pages)
+    if rows:
+        tmp_path.replace(path)
+    else:
+        tmp_path.unlink(missing_ok=True)
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export case data to CSV or Parquet.")
+    parser.add_argument('out_file', type=Path, help="Output file; .csv or .parquet picks the format.")
+    parser.add_argument('--iso3', nargs='+', default=None, help="Only these countries (default: all).")
+    parser.add_argument('--start', default=None, help="First month, YYYY-MM-DD (inclusive).")
+    parser.add_argument('--end', default=None, help="Last month, YYYY-MM-DD (inclusive).")
+    parser.add_argument('--format', choices=FORMATS, default=None)
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help="Rows read and written per page.")
+    args = parser.parse_args(argv)
+
+    rows = export_cases(args.out_file, args.iso3, args.start, args.end, args.format, args.page_size)
+    if rows:
+        print(f"Exported {rows:,} rows to {args.out_file}.")
+    else:
+        print("No case data found for the specified criteria.")
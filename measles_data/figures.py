@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from measles_data.cache import data_version
+from measles_data.instrumentation import stage
+
+# Process-wide render cache for page figures. Entries are keyed on
+# (page, chart, filter parameters, data version) and hold the finished output:
+# PNG bytes for matplotlib, plotly's JSON for plotly figures. A repeat view with
+# the same settings skips both the aggregation and the rendering.
+# Least recently used entries are evicted once the total size passes the budget.
+
+# Total bytes kept across all entries; FIGURE_CACHE_BYTES=0 disables the cache
+DEFAULT_BUDGET = int(os.environ.get('FIGURE_CACHE_BYTES', 64 * 1024 * 1024))
+
+# Same output st.pyplot produces, so cached images look identical
+PNG_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200, 'format': 'png'}
+
+class FigureCache:
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        # value is bytes or str; anything larger than the whole budget is not kept
+        size = len(value)
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            if size > self.budget:
+                return
+            self._entries[key] = value
+            self.size += size
+            while self.size > self.budget:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.size, 'budget': self.budget,
+                    'hits': self.hits, 'misses': self.misses}
+
+figure_cache = FigureCache()
+
+def _key(page, chart, params):
+    # params is a dict of the filter settings the chart depends on
+    return (page, chart, tuple(sorted(params.items())), data_version())
+
+def render_png(page, chart, params, build):
+    # build() makes and returns a matplotlib figure (or None when there is nothing
+    # to draw, which is not cached); returns the PNG bytes or None
+    key = _key(page, chart, params)
+    png = figure_cache.get(key)
+    if png is None:
+        import matplotlib.pyplot as plt
+
+        with stage(f'{page}:{chart}:build'):
+            fig = build()
+        if fig is None:
+            return None
+        buffer = io.BytesIO()
+        with stage(f'{page}:{chart}:serialize'):
+            fig.savefig(buffer, **PNG_OPTIONS)
+        plt.close(fig)
+        png = buffer.getvalue()
+        figure_cache.put(key, png)
+    return png
+
+def render_plotly(page, chart, params, build):
+    # build() makes and returns a plotly figure (or None when there is nothing to draw,
+    # which is not cached); returns its JSON as a dict for st.plotly_chart, or None
+    key = _key(page, chart, params)
+    figure_json = figure_cache.get(key)
+    if figure_json is None:
+        with stage(f'{page}:{chart}:build'):
+            fig = build()
+        if fig is None:
+            return None
+        with stage(f'{page}:{chart}:serialize'):
+            figure_json = fig.to_json()
+        figure_cache.put(key, figure_json)
+    return json.loads(figure_json)
@@ -0,0 +1,270 @@
+import functools
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+from measles_data.models import database
+
+# Opt-in timing of the hot paths (CASE_INSTRUMENT=1, or enable() at runtime, e.g. from
+# the Diagnostics page). Two kinds of records go into one ring buffer of recent timings:
+#   'query'  every SQL statement run through the pooled database: its text, rows fetched
+#            and seconds spent executing and fetching (a hook on database.execute_sql)
+#   'stage'  named stages of the data layer and the pages: data prep (@timed on the
+#            query/compute helpers) and figure build / serialization (measles_data.figures)
+# summary() gives p50/p95 per stage, slowest_queries() the worst statements. With
+# prometheus_client the same timings feed histograms, served by metrics_text(), by the
+# HTTP service's /metrics and, with CASE_METRICS_PORT set, by a standalone endpoint.
+# Disabled, @timed and stage() cost one flag check.
+
+BUFFER_SIZE = int(os.environ.get('CASE_INSTRUMENT_BUFFER', 5000))
+METRICS_PORT = os.environ.get('CASE_METRICS_PORT')
+
+_state = {'enabled': False, 'metrics_server': False}
+_lock = threading.Lock()
+_records = deque(maxlen=BUFFER_SIZE)
+
+class Timing:
+    # One entry in the ring buffer; query entries are updated while their rows are fetched
+    __slots__ = ('kind', 'name', 'started', 'seconds', 'rows', 'sql')
+
+    def __init__(self, kind, name, started, seconds, rows=None, sql=None):
+        self.kind, self.name, self.started, self.seconds, self.rows, self.sql = kind, name, started, seconds, rows, sql
+
+def is_enabled():
+    return _state['enabled']
+
+def _record(timing):
+    with _lock:
+        _records.append(timing)
+
+# -----------------------------------------------------------------------------
+# Stages
+
+class stage:
+    # Context manager timing one named stage: with stage('time_series:decomposition:build'): ...
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if _state['enabled']:
+            seconds = time.perf_counter() - self.started
+            _record(Timing('stage', self.name, time.time() - seconds, seconds))
+            _observe_stage(self.name, seconds)
+        return False
+
+def timed(name=None):
+    # Decorator recording each call of func as a stage (default name: module.function)
+    def decorate(func):
+        stage_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return func(*args, **kwargs)
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# -----------------------------------------------------------------------------
+# Query hook
+
+STATEMENT = re.compile(r'^\s*(\w+)(?:.*?\b(?:FROM|INTO|UPDATE)\s+"?([\w.]+)"?)?', re.IGNORECASE | re.DOTALL)
+
+def statement_name(sql):
+    # 'SELECT case_data' style label for a statement (operation and first table)
+    match = STATEMENT.match(sql)
+    if not match:
+        return 'OTHER'
+    operation, table = match.group(1).upper(), match.group(2)
+    return f"{operation} {table}" if table else operation
+
+class _TimedCursor:
+    # Wraps a DB-API cursor so the rows fetched and the fetch time land on its Timing entry
+    __slots__ = ('_cursor', '_timing', '_done')
+
+    def __init__(self, cursor, timing):
+        self._cursor, self._timing, self._done = cursor, timing, False
+
+    def _fetched(self, seconds, rows, finished):
+        self._timing.seconds += seconds
+        self._timing.rows = (self._timing.rows or 0) + rows
+        if finished and not self._done:
+            self._done = True
+            _observe_query(self._timing.name, self._timing.seconds)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(time.perf_counter() - start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._fetched(time.perf_counter() - start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(time.perf_counter() - start, len(rows), True)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __del__(self):
+        # statements read only partly (e.g. one row of a .get()) are observed when dropped
+        if not self._done:
+            self._done = True
+            _observe_query(self._timing.name, self._timing.seconds)
+
+def _execute_sql(sql, params=None, *args, **kwargs):
+    # Replaces database.execute_sql while instrumentation is enabled
+    started = time.perf_counter()
+    cursor = type(database).execute_sql(database, sql, params, *args, **kwargs)
+    seconds = time.perf_counter() - started
+    timing = Timing('query', statement_name(sql), time.time() - seconds, seconds, sql=sql)
+    _record(timing)
+    if cursor.description is None:
+        # no result set (DML / DDL): rowcount is the number of rows changed
+        timing.rows = max(cursor.rowcount, 0)
+        _observe_query(timing.name, seconds)
+        return cursor
+    return _TimedCursor(cursor, timing)
+
+# -----------------------------------------------------------------------------
+# Prometheus
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+def _prometheus():
+    # Histograms in a registry of their own, created on first use (None without prometheus_client)
+    if 'registry' in _metrics:
+        return _metrics['registry']
+    with _metrics_lock:
+        if 'registry' in _metrics:
+            return _metrics['registry']
+        try:
+            from prometheus_client import CollectorRegistry, Histogram
+        except ImportError:
+            _metrics['registry'] = None
+            return None
+        registry = CollectorRegistry()
+        buckets = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+        _metrics.update({
+            'stage': Histogram('case_stage_seconds', 'Time spent in instrumented stages', ['stage'],
+                               buckets=buckets, registry=registry),
+            'query': Histogram('case_query_seconds', 'Time spent executing and fetching SQL statements',
+                               ['statement'], buckets=buckets, registry=registry),
+        })
+        registry.register(_CacheCollector())
+        _metrics['registry'] = registry
+    return registry
+
+class _CacheCollector:
+    # Render cache counters, read when the endpoint is scraped
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+        from measles_data.figures import figure_cache
+
+        stats = figure_cache.stats()
+        yield CounterMetricFamily('case_figure_cache_hits', 'Render cache hits', value=stats['hits'])
+        yield CounterMetricFamily('case_figure_cache_misses', 'Render cache misses', value=stats['misses'])
+        yield GaugeMetricFamily('case_figure_cache_bytes', 'Bytes held by the render cache', value=stats['bytes'])
+
+def _observe_stage(name, seconds):
+    if _prometheus() is not None:
+        _metrics['stage'].labels(name).observe(seconds)
+
+def _observe_query(name, seconds):
+    if _prometheus() is not None:
+        _metrics['query'].labels(name).observe(seconds)
+
+def metrics_text():
+    # Prometheus text exposition of the histograms, or None without prometheus_client
+    registry = _prometheus()
+    if registry is None:
+        return None
+    from prometheus_client import generate_latest
+    return generate_latest(registry)
+
+def _start_metrics_server():
+    # One standalone /metrics endpoint per process when CASE_METRICS_PORT is set
+    with _lock:
+        if not METRICS_PORT or _state['metrics_server'] or _prometheus() is None:
+            return
+        from prometheus_client import start_http_server
+        start_http_server(int(METRICS_PORT), registry=_metrics['registry'])
+        _state['metrics_server'] = True
+
+# -----------------------------------------------------------------------------
+# Switches and reports
+
+def enable():
+    _state['enabled'] = True
+    database.execute_sql = _execute_sql
+    _start_metrics_server()
+
+def disable():
+    _state['enabled'] = False
+    database.__dict__.pop('execute_sql', None)
+
+def reset():
+    with _lock:
+        _records.clear()
+
+def records(kind=None):
+    # Snapshot of the ring buffer as a DataFrame, oldest first
+    with _lock:
+        entries = list(_records)
+    frame = pd.DataFrame({
+        'kind': [t.kind for t in entries],
+        'name': [t.name for t in entries],
+        'started': pd.to_datetime([t.started for t in entries], unit='s'),
+        'ms': [t.seconds * 1000 for t in entries],
+        'rows': pd.array([t.rows for t in entries], dtype='Int64'),
+        'sql': [t.sql for t in entries],
+    })
+    return frame if kind is None else frame[frame['kind'] == kind].reset_index(drop=True)
+
+def summary(kind=None):
+    # count / p50 / p95 / max / total milliseconds per (kind, name), slowest p95 first
+    frame = records(kind)
+    if frame.empty:
+        return pd.DataFrame(columns=['kind', 'name', 'count', 'p50_ms', 'p95_ms', 'max_ms', 'total_ms'])
+    grouped = frame.groupby(['kind', 'name'])['ms']
+    table = pd.DataFrame({
+        'count': grouped.size(),
+        'p50_ms': grouped.quantile(0.5),
+        'p95_ms': grouped.quantile(0.95),
+        'max_ms': grouped.max(),
+        'total_ms': grouped.sum(),
+    }).reset_index()
+    return table.sort_values('p95_ms', ascending=False, ignore_index=True)
+
+def slowest_queries(n=20):
+    frame = records('query')
+    return frame.nlargest(n, 'ms')[['started', 'name', 'ms', 'rows', 'sql']].reset_index(drop=True)
+
+if os.environ.get('CASE_INSTRUMENT', '').lower() in ('1', 'true', 'yes'):
+    enable()
@@ -0,0 +1,142 @@
+from peewee import Model, CharField, DateField, IntegerField, FloatField, ForeignKeyField, CompositeKey
+
+from measles_data.connection import database, BASE_DIR, DB_PATH
+
+# Shared Peewee models. Importing this module only defines classes; connections
+# are borrowed from the pool in measles_data.connection on the first query.
+
+# Define a BaseModel class
+class BaseModel(Model):
+    class Meta:
+        database = database
+
+# Define the Country model
+class Country(BaseModel):
+    iso3 = CharField(primary_key=True)
+    country = CharField()
+    region = CharField()
+
+    class Meta:
+        table_name = 'country'
+        indexes = (
+            (('region', 'iso3'), False), # Covering index for region filters joined to case data
+        )
+
+# Define the CaseData model
+class CaseData(BaseModel):
+    country_iso3 = ForeignKeyField(Country, to_field='iso3', backref='cases')
+    date = DateField()
+    measles_suspect = FloatField(null=True)
+    measles_clinical = FloatField(null=True)
+    measles_epi_linked = FloatField(null=True)
+    measles_lab_confirmed = FloatField(null=True)
+    measles_total = FloatField(null=True)
+    rubella_clinical = FloatField(null=True)
+    rubella_epi_linked = FloatField(null=True)
+    rubella_lab_confirmed = FloatField(null=True)
+    rubella_total = FloatField(null=True)
+    discarded = FloatField(null=True)
+    month_ordinal = IntegerField(null=True) # year * 12 + month - 1, read without parsing date strings
+    missing_mask = IntegerField(default=0)  # bit k set when CASE_COLUMNS[k] was blank in the CSV (stored as 0)
+
+    class Meta:
+        table_name = 'case_data'
+        indexes = (
+            (('country_iso3', 'date'), True), # Ensure unique combination of country and date
+            (('date', 'country_iso3'), False), # Date range filters across all countries
+        )
+
+# Define the YearlyStats model (one row per country and year from cases_year.csv)
+class YearlyStats(BaseModel):
+    country_iso3 = ForeignKeyField(Country, to_field='iso3', backref='yearly_stats')
+    year = IntegerField()
+    total_population = IntegerField(null=True)
+    annualized_population_most_recent_year_only = IntegerField(null=True)
+    total_suspected_measles_rubella_cases = IntegerField(null=True)
+    measles_total = IntegerField(null=True)
+    measles_lab_confirmed = IntegerField(null=True)
+    measles_epi_linked = IntegerField(null=True)
+    measles_clinical = IntegerField(null=True)
+    measles_incidence_rate_per_1000000_total_population = FloatField(null=True)
+    rubella_total = IntegerField(null=True)
+    rubella_lab_confirmed = IntegerField(null=True)
+    rubella_epi_linked = IntegerField(null=True)
+    rubella_clinical = IntegerField(null=True)
+    rubella_incidence_rate_per_1000000_total_population = FloatField(null=True)
+    discarded_cases = IntegerField(null=True)
+    discarded_non_measles_rubella_cases_per_100000_total_population = FloatField(null=True)
+
+    class Meta:
+        table_name = 'yearly_stats'
+        indexes = (
+            (('country_iso3', 'year'), True), # Ensure unique combination of country and year
+        )
+
+# Metric columns stored on CaseData
+CASE_COLUMNS = [
+    'measles_suspect', 'measles_clinical', 'measles_epi_linked',
+    'measles_lab_confirmed', 'measles_total', 'rubella_clinical',
+    'rubella_epi_linked', 'rubella_lab_confirmed', 'rubella_total', 'discarded'
+]
+
+# Materialized sums of every case column, maintained by the ETL (see measles_data.etl.refresh_rollups)
+class RollupModel(BaseModel):
+    row_count = IntegerField()
+    measles_suspect = FloatField(null=True)
+    measles_clinical = FloatField(null=True)
+    measles_epi_linked = FloatField(null=True)
+    measles_lab_confirmed = FloatField(null=True)
+    measles_total = FloatField(null=True)
+    rubella_clinical = FloatField(null=True)
+    rubella_epi_linked = FloatField(null=True)
+    rubella_lab_confirmed = FloatField(null=True)
+    rubella_total = FloatField(null=True)
+    discarded = FloatField(null=True)
+
+# Define the RegionMonthRollup model (one row per region and month)
+class RegionMonthRollup(RollupModel):
+    region = CharField()
+    date = DateField()
+
+    class Meta:
+        table_name = 'region_month_rollup'
+        primary_key = CompositeKey('region', 'date')
+
+# Define the CountryYearRollup model (one row per country and year)
+class CountryYearRollup(RollupModel):
+    country_iso3 = ForeignKeyField(Country, to_field='iso3', index=False) # covered by the primary key
+    year = IntegerField()
+
+    class Meta:
+        table_name = 'country_year_rollup'
+        primary_key = CompositeKey('country_iso3', 'year')
+
+# Content hash of the case figures last loaded for each (country, month)
+class LoadState(BaseModel):
+    country_iso3 = CharField()
+    date = DateField()
+    row_hash = IntegerField()
+
+    class Meta:
+        table_name = 'load_state'
+        primary_key = CompositeKey('country_iso3', 'date')
+
+# Multiplicative seasonal decomposition (period 12) of cases + 1 per region, or 'ALL' for the
+# global total, for every case column; maintained by the ETL (see measles_data.decomposition)
+class SeasonalDecomposition(BaseModel):
+    series = CharField()
+    metric = CharField()
+    date = DateField()
+    observed = FloatField()
+    trend = FloatField(null=True) # undefined for the first and last 6 months
+    seasonal = FloatField()
+    resid = FloatField(null=True)
+
+    class Meta:
+        table_name = 'seasonal_decomposition'
+        primary_key = CompositeKey('series', 'metric', 'date')
+
+# Columns stored on YearlyStats besides the key
+YEARLY_COLUMNS = [f.name for f in YearlyStats._meta.sorted_fields if f.name not in ('id', 'country_iso3')]
+
+MODELS = [Country, CaseData, YearlyStats, LoadState, RegionMonthRollup, CountryYearRollup, SeasonalDecomposition]
@@ -0,0 +1,414 @@
+import datetime
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from peewee import DateField, IntegerField, FloatField, Tuple, fn, SQL
+
+from measles_data.connection import pooled
+from measles_data.instrumentation import timed
+from measles_data.models import (database, Country, CaseData, YearlyStats, RegionMonthRollup, CountryYearRollup,
+                                 CASE_COLUMNS)
+
+def _column_array(values, node):
+    # Converts one column of raw cursor values to a typed NumPy array
+    field = node.unwrap()
+    if isinstance(field, DateField):
+        # SQLite stores dates as 'YYYY-MM-DD' text, which NumPy parses directly
+        return np.array(values, dtype='datetime64[D]').astype('datetime64[ns]')
+    if isinstance(field, FloatField):
+        return np.array(values, dtype=np.float64)
+    if isinstance(field, IntegerField) and None not in values:
+        return np.array(values, dtype=np.int64)
+    array = np.array(values)
+    if array.dtype.kind in ('U', 'S'):
+        array = array.astype(object)
+    return array
+
+def _read_columns(query):
+    # Runs a select on the raw cursor and builds the DataFrame column by column,
+    # skipping the per-row model/dict objects Peewee would otherwise create
+    cursor = database.execute(query)
+    names = [column[0] for column in cursor.description]
+    rows = cursor.fetchall()
+    if not rows:
+        return pd.DataFrame(columns=names)
+    columns = zip(*rows)
+    return pd.DataFrame({
+        name: _column_array(values, node)
+        for name, values, node in zip(names, columns, query._returning)
+    })
+
+@timed()
+@pooled
+def get_monthly_cases(bulk=True, backend=None):
+    # bulk=True reads columns straight from the cursor and returns 'date' as datetime64[ns];
+    # bulk=False keeps the original dict-per-row path.
+    # backend (default: CASE_BACKEND, else 'snapshot') picks where the frame comes from:
+    #   'snapshot'  the ETL's memory-mapped Arrow snapshot, falling back to SQL when it is missing or stale
+    #   'cube'      the in-memory case cube
+    #   'compact'   category keys and nullable Int32 counts (NA where the source was blank)
+    #   'sql'       the database
+    backend = backend or os.environ.get('CASE_BACKEND', 'snapshot')
+    if backend == 'cube':
+        from measles_data.cube import get_cube
+        return get_cube().to_frame()
+    if backend == 'compact':
+        from measles_data.compact import load_compact
+        return load_compact()
+    if backend == 'snapshot' and bulk:
+        from measles_data.snapshot import read_snapshot
+        snapshot = read_snapshot()
+        if snapshot is not None:
+            return snapshot
+    if bulk:
+        query = (CaseData
+                 .select(Country.iso3, Country.country, Country.region, CaseData.date,
+                         *[getattr(CaseData, column) for column in CASE_COLUMNS])
+                 .join(Country))
+        return _read_columns(query)
+
+    query = CaseData.select(Country, CaseData).join(Country)
+    monthly_cases = pd.DataFrame(list(query.dicts()))
+    monthly_cases.drop(columns=['id', 'country_iso3', 'month_ordinal', 'missing_mask'], inplace=True, errors='ignore')
+    return monthly_cases
+
+@pooled
+def get_countries():
+    fields_to_select = [f for f in Country._meta.sorted_fields if f.name != 'id']
+    query = Country.select(*fields_to_select)
+    countries = pd.DataFrame(list(query.dicts()))
+    return countries
+
+# Columns that get_aggregated_cases can group by
+GROUP_FIELDS = {
+    'date': CaseData.date,
+    'year': fn.strftime('%Y', CaseData.date).cast('INTEGER'),
+    'month': fn.strftime('%m', CaseData.date).cast('INTEGER'),
+    'region': Country.region,
+    'iso3': Country.iso3,
+    'country': Country.country,
+}
+
+AGGREGATES = {
+    'sum': fn.SUM,
+    'mean': fn.AVG,
+    'min': fn.MIN,
+    'max': fn.MAX,
+    'count': fn.COUNT,
+}
+
+def _to_date(value):
+    # Accepts 'YYYY-MM-DD' strings, dates, datetimes and pandas Timestamps
+    return pd.Timestamp(value).date()
+
+def _rollups_available():
+    return RegionMonthRollup.table_exists() and RegionMonthRollup.select().exists()
+
+def _rollup_value(model, metric, agg):
+    # Rollups hold sums and row counts, so only sum, count and mean can be answered from them
+    # (the ETL stores missing counts as 0, so every row counts towards the mean)
+    total = fn.SUM(getattr(model, metric))
+    if agg == 'sum':
+        return total
+    if agg == 'count':
+        return fn.SUM(model.row_count)
+    return total / fn.SUM(model.row_count)
+
+def _rollup_query(metric, regions, date_range, group_by, agg):
+    # The same aggregate over region_month_rollup or country_year_rollup, or None if neither covers it
+    if agg not in ('sum', 'mean', 'count'):
+        return None
+
+    if set(group_by) <= {'date', 'year', 'month', 'region'}:
+        model = RegionMonthRollup
+        fields = {
+            'date': model.date,
+            'year': fn.strftime('%Y', model.date).cast('INTEGER'),
+            'month': fn.strftime('%m', model.date).cast('INTEGER'),
+            'region': model.region,
+        }
+        region_field, date_filter = model.region, None
+        if date_range:
+            date_filter = model.date.between(_to_date(date_range[0]), _to_date(date_range[1]))
+    elif set(group_by) <= {'year', 'region', 'iso3', 'country'}:
+        # Yearly rows can only serve date ranges made of whole years
+        model = CountryYearRollup
+        fields = {'year': model.year, 'region': Country.region, 'iso3': Country.iso3, 'country': Country.country}
+        region_field, date_filter = Country.region, None
+        if date_range:
+            start_date, end_date = _to_date(date_range[0]), _to_date(date_range[1])
+            if (start_date.month, start_date.day, end_date.month, end_date.day) != (1, 1, 12, 31):
+                return None
+            date_filter = model.year.between(start_date.year, end_date.year)
+    else:
+        return None
+
+    group_fields = [fields[g] for g in group_by]
+    query = model.select(*[f.alias(g) for g, f in zip(group_by, group_fields)],
+                         _rollup_value(model, metric, agg).alias(metric))
+    if model is CountryYearRollup and (regions or set(group_by) - {'year'}):
+        query = query.join(Country)
+    if regions:
+        query = query.where(region_field.in_(list(regions)))
+    if date_filter is not None:
+        query = query.where(date_filter)
+    if group_fields:
+        query = query.group_by(*group_fields).order_by(*group_fields)
+    return query
+
+@timed()
+@pooled
+def get_aggregated_cases(metric, regions=None, date_range=None, group_by=('date', 'region'), agg='sum', use_rollups=True):
+    # Aggregates one metric in SQL and returns one row per group.
+    # regions is a list of region codes (e.g. ['AFR', 'EUR']), date_range an inclusive (start, end) pair.
+    # Groupings covered by a rollup table are answered from it instead of scanning case_data.
+    if metric not in CASE_COLUMNS:
+        raise ValueError(f"Unknown metric '{metric}'. Expected one of {CASE_COLUMNS}.")
+    if agg not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate '{agg}'. Expected one of {list(AGGREGATES)}.")
+    group_by = list(group_by)
+    unknown = [g for g in group_by if g not in GROUP_FIELDS]
+    if unknown:
+        raise ValueError(f"Cannot group by {unknown}. Expected any of {list(GROUP_FIELDS)}.")
+
+    if use_rollups and _rollups_available():
+        query = _rollup_query(metric, regions, date_range, group_by, agg)
+        if query is not None:
+            return _read_columns(query)
+
+    group_fields = [GROUP_FIELDS[g] for g in group_by]
+    value = AGGREGATES[agg](getattr(CaseData, metric)).alias(metric)
+    query = CaseData.select(*[f.alias(g) for g, f in zip(group_by, group_fields)], value)
+
+    # The join is only needed when the region or country is used
+    if regions or any(g in ('region', 'iso3', 'country') for g in group_by):
+        query = query.join(Country)
+    if regions:
+        query = query.where(Country.region.in_(list(regions)))
+    if date_range:
+        start_date, end_date = date_range
+        query = query.where(CaseData.date.between(_to_date(start_date), _to_date(end_date)))
+    if group_fields:
+        query = query.group_by(*group_fields).order_by(*group_fields)
+
+    return _read_columns(query)
+
+def _median_ranking(value, condition, n, descending):
+    # Countries ranked by the per-country median of value, computed with window functions:
+    # each country's rows are numbered in value order and the middle one or two are averaged
+    partition = [YearlyStats.country_iso3]
+    ranked = (YearlyStats
+              .select(YearlyStats.country_iso3.alias('iso3'),
+                      value.alias('value'),
+                      fn.ROW_NUMBER().over(partition_by=partition, order_by=[value]).alias('rn'),
+                      fn.COUNT(SQL('*')).over(partition_by=partition).alias('cnt'))
+              .where(condition & value.is_null(False))
+              .alias('ranked'))
+    median = fn.AVG(ranked.c.value)
+    query = (YearlyStats
+             .select(ranked.c.iso3, median.alias('median'))
+             .from_(ranked)
+             .where(ranked.c.rn.between((ranked.c.cnt + 1) / 2, (ranked.c.cnt + 2) / 2))
+             .group_by(ranked.c.iso3)
+             .order_by(median.desc() if descending else median, ranked.c.iso3)
+             .limit(n))
+    return [iso3 for iso3, _ in database.execute(query)]
+
+def _yearly_rows(iso3_codes, value, value_name, condition):
+    # Yearly rows of the given countries, with the plotted value and the country name
+    query = (YearlyStats
+             .select(Country.iso3, Country.country, YearlyStats.year, YearlyStats.measles_total,
+                     YearlyStats.total_population, value.alias(value_name))
+             .join(Country)
+             .where(Country.iso3.in_(iso3_codes) & condition))
+    return _read_columns(query)
+
+def _ranked_rows(value, value_name, condition, n, descending):
+    iso3_codes = _median_ranking(value, condition, n, descending)
+    rows = _yearly_rows(iso3_codes, value, value_name, condition)
+    names = dict(zip(rows['iso3'], rows['country']))
+    return [names[iso3] for iso3 in iso3_codes if iso3 in names], rows
+
+@timed()
+@pooled
+def get_top_incidence(n=20):
+    # Top n countries by median measles incidence per 1M population.
+    # Returns (country names in rank order, their yearly rows with a 'measles_per1M' column).
+    value = YearlyStats.measles_incidence_rate_per_1000000_total_population
+    return _ranked_rows(value, 'measles_per1M', SQL('1 = 1'), n, descending=True)
+
+@timed()
+@pooled
+def get_bottom_lab_confirmed_ratio(n=20):
+    # Bottom n countries by median laboratory confirmed case ratio, over years with measles cases.
+    # Returns (country names in rank order, their yearly rows with a 'lab_confirmed_ratio' column).
+    value = YearlyStats.measles_lab_confirmed.cast('REAL') / YearlyStats.measles_total
+    return _ranked_rows(value, 'lab_confirmed_ratio', YearlyStats.measles_total > 0, n, descending=False)
+
+_country_lock = threading.Lock()
+_country_cache = {'version': None, 'countries': None}
+
+@pooled
+def country_map():
+    # iso3 -> Country for every country, loaded in one query and kept until the database changes
+    from measles_data.cache import data_version
+    version = data_version()
+    with _country_lock:
+        if _country_cache['version'] != version:
+            _country_cache['countries'] = {country.iso3: country for country in Country.select()}
+            _country_cache['version'] = version
+        return _country_cache['countries']
+
+def _iso3_list(iso3_codes):
+    # One code or an iterable of codes -> upper-cased codes, duplicates dropped, order kept
+    if isinstance(iso3_codes, str):
+        iso3_codes = [iso3_codes]
+    return list(dict.fromkeys(code.upper() for code in iso3_codes))
+
+@timed()
+@pooled
+def get_cases(iso3_codes=None, start_date=None, end_date=None, as_frame=False):
+    # Case rows of the given countries (one code or a list; None for all) between two
+    # inclusive dates, in one query whatever the number of countries or rows.
+    # Returns CaseData instances whose country_iso3 is already the Country (from
+    # country_map(), so reading it issues no query), ordered by country and date
+    # (by date and country when a date range is given); as_frame=True returns the
+    # columns of get_monthly_cases() instead.
+    query = CaseData.select()
+    columns = [Country.iso3, Country.country, Country.region, CaseData.date] + [getattr(CaseData, c) for c in CASE_COLUMNS]
+    condition = SQL('1 = 1')
+    if iso3_codes is not None:
+        condition &= CaseData.country_iso3.in_(_iso3_list(iso3_codes))
+    if start_date is not None:
+        condition &= CaseData.date >= _to_date(start_date)
+    if end_date is not None:
+        condition &= CaseData.date <= _to_date(end_date)
+    order = ([CaseData.date, CaseData.country_iso3] if start_date is not None or end_date is not None
+             else [CaseData.country_iso3, CaseData.date])
+
+    if as_frame:
+        return _read_columns(CaseData.select(*columns).join(Country).where(condition).order_by(*order))
+    countries = country_map()
+    cases = list(query.where(condition).order_by(*order))
+    for case in cases:
+        case.country_iso3 = countries[case.country_iso3_id]
+    return cases
+
+# Rows per page of the streaming iterators
+PAGE_SIZE = 5000
+
+@pooled
+def _case_page(codes, start_date, end_date, after, page_size):
+    # One page of case rows ordered by (date, iso3), starting after the (date, iso3) key `after`
+    # coerce(False) skips Peewee's per-value converters: SQLite already returns floats and text
+    fields = [CaseData.date, Country.iso3, Country.country, Country.region] + [getattr(CaseData, c) for c in CASE_COLUMNS]
+    query = CaseData.select(*[field.coerce(False) for field in fields]).join(Country)
+    if codes is not None:
+        query = query.where(CaseData.country_iso3.in_(codes))
+    if start_date is not None:
+        query = query.where(CaseData.date >= start_date)
+    if end_date is not None:
+        query = query.where(CaseData.date <= end_date)
+    if after is not None:
+        query = query.where(Tuple(CaseData.date, CaseData.country_iso3) > Tuple(*after))
+    query = query.order_by(CaseData.date, CaseData.country_iso3).limit(page_size)
+    return list(query.namedtuples().iterator())
+
+def iter_case_pages(iso3_codes=None, start_date=None, end_date=None, page_size=PAGE_SIZE):
+    # Streams case rows as lists of at most page_size namedtuples (date as 'YYYY-MM-DD' text,
+    # iso3, country, region, case columns...), ordered by (date, iso3). Pages are keyset-paginated: each one is an
+    # index seek past the last key of the previous page, so memory stays bounded by page_size
+    # and late pages cost the same as early ones. The connection goes back to the pool between pages.
+    codes = None if iso3_codes is None else _iso3_list(iso3_codes)
+    start_date = None if start_date is None else _to_date(start_date)
+    end_date = None if end_date is None else _to_date(end_date)
+    after = None
+    while True:
+        page = _case_page(codes, start_date, end_date, after, page_size)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after = (page[-1].date, page[-1].iso3)
+
+def iter_cases(iso3_codes=None, start_date=None, end_date=None, page_size=PAGE_SIZE):
+    # Row-at-a-time view of iter_case_pages
+    for page in iter_case_pages(iso3_codes, start_date, end_date, page_size):
+        yield from page
+
+def iter_cases_by_date_range(start_date_str, end_date_str, iso3_code=None, page_size=PAGE_SIZE):
+    # Streaming counterpart of get_cases_by_date_range
+    return iter_cases(iso3_code, start_date_str, end_date_str, page_size)
+
+def _known_countries(iso3_code):
+    # The Country rows of the requested codes that exist, reporting the rest
+    countries = country_map()
+    codes = _iso3_list(iso3_code)
+    for code in codes:
+        if code not in countries:
+            print(f"Country with ISO3 code '{code}' not found.")
+    return [countries[code] for code in codes if code in countries]
+
+def _describe(countries):
+    return ', '.join(f"{country.country} ({country.iso3})" for country in countries)
+
+@pooled
+def get_cases_by_country(iso3_code, as_frame=False):
+    # Returns all case data records for a country by ISO3 code (or for a list of codes)
+    try:
+        countries = _known_countries(iso3_code)
+        if not countries:
+            return pd.DataFrame() if as_frame else []
+        print(f"Retrieving case data for {_describe(countries)}...")
+        cases = get_cases([country.iso3 for country in countries], as_frame=as_frame)
+        if len(cases) == 0:
+            print(f"No case data found for {_describe(countries)}.")
+        return cases
+    except Exception as e:
+        print(f"Error retrieving cases for {iso3_code}: {e}")
+        return pd.DataFrame() if as_frame else []
+
+@pooled
+def get_cases_by_date_range(start_date_str, end_date_str, iso3_code=None, as_frame=False):
+    # Returns case data records within a date range, optionally filtered by country (one code or a list)
+    try:
+        start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
+
+        codes = None
+        if iso3_code:
+            countries = _known_countries(iso3_code)
+            if countries:
+                codes = [country.iso3 for country in countries]
+                print(f"Retrieving case data for {_describe(countries)} between {start_date_str} and {end_date_str}...")
+            else:
+                print(f"Querying all countries for the date range.")
+        else:
+            print(f"Retrieving case data for all countries between {start_date_str} and {end_date_str}...")
+
+        cases = get_cases(codes, start_date, end_date, as_frame=as_frame)
+        if len(cases) == 0:
+            print(f"No case data found for the specified criteria.")
+        return cases
+    except ValueError:
+        print("Invalid date format. Please use 'YYYY-MM-DD'.")
+        return pd.DataFrame() if as_frame else []
+    except Exception as e:
+        print(f"Error retrieving cases by date range: {e}")
+        return pd.DataFrame() if as_frame else []
+
+def get_country_info(iso3_code):
+    # Returns country name and region for a given ISO3 code
+    try:
+        country = country_map().get(iso3_code.upper())
+        if country:
+            print(f"Retrieving info for country with ISO3 code '{iso3_code}'...")
+            return {'iso3': country.iso3, 'country': country.country, 'region': country.region}
+        else:
+            print(f"Country with ISO3 code '{iso3_code}' not found.")
+            return None
+    except Exception as e:
+        print(f"Error retrieving country info for {iso3_code}: {e}")
+        return None
@@ -0,0 +1,83 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+from measles_data.cache import get_dataset, data_version
+from measles_data.instrumentation import timed
+
+# Seasonal statistics for the Seasonal Trends page, computed in one pass per
+# (case column, regions, data version). Sums and counts are scattered into a
+# (region, year, month) cube with np.bincount; the heatmap, monthly means and
+# per-region monthly means are reductions of that cube. The per-month
+# distributions (box plot, median, std, min, max) come from a single sort by month.
+
+MONTHS = np.arange(1, 13)
+
+def _divide(sums, counts):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def _month_stats(groups):
+    # mean/median/std/min/max/count of each month's values, as the page's table shows them
+    def stat(func, minimum=1):
+        return [func(g) if len(g) >= minimum else np.nan for g in groups]
+    return pd.DataFrame({
+        'Mean': stat(np.mean),
+        'Median': stat(np.median),
+        'Std Dev': stat(lambda g: np.std(g, ddof=1), minimum=2),
+        'Min': stat(np.min),
+        'Max': stat(np.max),
+        'Count': [len(g) for g in groups],
+    }, index=pd.Index(MONTHS, name='month'))
+
+@functools.lru_cache(maxsize=64)
+@timed()
+def _seasonal_stats(case_column, regions, version):
+    data = get_dataset()
+    selected = data.loc[data['region'].isin(regions) & data[case_column].notna(), ['region', 'year', 'month', case_column]]
+    values = selected[case_column].to_numpy(dtype='float64')
+    region_idx = pd.Categorical(selected['region'], categories=regions).codes
+    first_year = int(data['year'].min())
+    years = np.arange(first_year, int(data['year'].max()) + 1)
+    year_idx = selected['year'].to_numpy() - first_year
+    month_idx = selected['month'].to_numpy() - 1
+
+    # (region, year, month) cube of sums and counts
+    shape = (len(regions), len(years), 12)
+    flat = np.ravel_multi_index((region_idx, year_idx, month_idx), shape)
+    size = int(np.prod(shape))
+    sums = np.bincount(flat, weights=values, minlength=size).reshape(shape)
+    counts = np.bincount(flat, minlength=size).reshape(shape)
+
+    year_month_sums = sums.sum(axis=0)
+    heatmap = pd.DataFrame(np.where(counts.sum(axis=0) > 0, year_month_sums, np.nan).T,
+                           index=pd.Index(MONTHS, name='month'), columns=pd.Index(years, name='year'))
+    heatmap = heatmap.dropna(axis=1, how='all')
+
+    monthly_mean = pd.Series(_divide(sums.sum(axis=(0, 1)), counts.sum(axis=(0, 1))),
+                             index=pd.Index(MONTHS, name='month'), name=case_column)
+    regional_mean = pd.DataFrame(_divide(sums.sum(axis=1), counts.sum(axis=1)).T,
+                                 index=pd.Index(MONTHS, name='month'), columns=pd.Index(regions, name='region'))
+
+    # Per-month value arrays from one stable sort
+    order = np.argsort(month_idx, kind='stable')
+    boundaries = np.searchsorted(month_idx[order], np.arange(1, 12))
+    by_month = np.split(values[order], boundaries)
+
+    # no peak or trough when the selection has no figures at all (e.g. an all-blank metric)
+    has_values = monthly_mean.notna().any()
+    return {
+        'heatmap': heatmap,             # month x year sums
+        'monthly_mean': monthly_mean,   # mean per country-month, by month
+        'regional_mean': regional_mean, # month x region means
+        'by_month': by_month,           # 12 arrays of values, January first
+        'month_stats': _month_stats(by_month),
+        'peak_month': int(monthly_mean.idxmax()) if has_values else None,
+        'trough_month': int(monthly_mean.idxmin()) if has_values else None,
+    }
+
+@timed()
+def get_seasonal_stats(case_column, regions):
+    # regions: region codes; returns the shared (read-only) result for the selection
+    return _seasonal_stats(case_column, tuple(sorted(regions)), data_version())
@@ -0,0 +1,205 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import tornado.ioloop
+import tornado.web
+
+from measles_data import connection, instrumentation
+from measles_data.cache import data_version, REGION_NAMES
+from measles_data.figures import FigureCache
+from measles_data.models import CASE_COLUMNS
+from measles_data.queries import (get_cases, get_countries, get_aggregated_cases, country_map, GROUP_FIELDS,
+                                  AGGREGATES)
+
+# Read-only HTTP/JSON service over the query helpers, for tools that want the
+# dashboards' data without loading the whole table themselves. Runs on Tornado
+# (shipped with Streamlit); queries run on a thread pool sized to the connection pool.
+#   GET /api/countries                          every country
+#   GET /api/countries/<iso3>                   one country (get_country_info)
+#   GET /api/countries/<iso3>/cases?start&end   its monthly rows (get_cases_by_country)
+#   GET /api/cases?start&end[&iso3=A,B]         monthly rows in a date range (get_cases_by_date_range)
+#   GET /api/aggregates?metric[&regions&start&end&group_by&agg]   get_aggregated_cases
+#   GET /api/version                            data version and response cache stats
+#   GET /metrics                                Prometheus text (measles_data.instrumentation)
+# Responses are JSON, or an Arrow IPC stream with ?format=arrow or Accept: application/vnd.apache.arrow.stream.
+# Each response carries an ETag derived from the data version and the request, so
+# If-None-Match revalidation costs no query. Encoded bodies (JSON pre-gzipped when the
+# client accepts it) are kept in an LRU until the database changes.
+# usage: python database_serve.py [--port N] [--address ADDR]
+
+DEFAULT_PORT = int(os.environ.get('SERVICE_PORT', 8600))
+RESPONSE_CACHE_BYTES = int(os.environ.get('SERVICE_CACHE_BYTES', 32 * 1024 * 1024))
+
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+JSON_TYPE = 'application/json; charset=UTF-8'
+
+response_cache = FigureCache(RESPONSE_CACHE_BYTES)
+executor = ThreadPoolExecutor(max_workers=connection.MAX_CONNECTIONS, thread_name_prefix='query')
+
+def _to_json(result):
+    if isinstance(result, pd.DataFrame):
+        frame = result.copy()
+        for column in frame.columns[frame.dtypes.map(pd.api.types.is_datetime64_any_dtype)]:
+            frame[column] = frame[column].dt.strftime('%Y-%m-%d')
+        result = frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+    return json.dumps(result, separators=(',', ':')).encode()
+
+def _to_arrow(result):
+    import pyarrow as pa
+
+    if isinstance(result, pd.DataFrame):
+        table = pa.Table.from_pandas(result, preserve_index=False)
+    else:
+        table = pa.Table.from_pylist(result if isinstance(result, list) else [result])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+class QueryHandler(tornado.web.RequestHandler):
+    # Subclasses implement load(*path_args) -> DataFrame, dict or list (None for 404); it runs on the executor
+
+    def compute_etag(self):
+        # ETags are set up front from the data version, not hashed from the body
+        return None
+
+    def _format(self):
+        requested = self.get_query_argument('format', None)
+        if requested in ('arrow', 'json'):
+            return requested
+        if requested is not None:
+            raise tornado.web.HTTPError(400, f"unknown format {requested!r}")
+        return 'arrow' if ARROW_TYPE in self.request.headers.get('Accept', '') else 'json'
+
+    def list_argument(self, name, allowed=None):
+        value = self.get_query_argument(name, None)
+        if value is None:
+            return None
+        values = [v.strip() for v in value.split(',') if v.strip()]
+        if allowed is not None:
+            unknown = [v for v in values if v not in allowed]
+            if unknown:
+                raise tornado.web.HTTPError(400, f"unknown {name}: {', '.join(unknown)}")
+        return values
+
+    def date_argument(self, name, required=False):
+        value = self.get_query_argument(name, None)
+        if value is None:
+            if required:
+                raise tornado.web.HTTPError(400, f"missing {name}")
+            return None
+        try:
+            timestamp = pd.Timestamp(value)
+        except ValueError:
+            timestamp = pd.NaT
+        # pd.Timestamp('') is NaT rather than an error
+        if pd.isna(timestamp):
+            raise tornado.web.HTTPError(400, f"invalid {name} {value!r}; use YYYY-MM-DD")
+        return timestamp.date()
+
+    async def get(self, *args):
+        fmt = self._format()
+        gzipped = fmt == 'json' and 'gzip' in self.request.headers.get('Accept-Encoding', '')
+        tag = hashlib.sha1(repr((data_version(), self.request.uri, fmt, gzipped)).encode()).hexdigest()[:20]
+        self.set_header('Etag', f'"{tag}"')
+        self.set_header('Cache-Control', 'no-cache')
+        self.set_header('Vary', 'Accept, Accept-Encoding')
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+
+        body = response_cache.get(tag)
+        if body is None:
+            result = await tornado.ioloop.IOLoop.current().run_in_executor(executor, self.load, *args)
+            if result is None:
+                raise tornado.web.HTTPError(404)
+            body = _to_arrow(result) if fmt == 'arrow' else _to_json(result)
+            if gzipped:
+                body = gzip.compress(body, compresslevel=6)
+            response_cache.put(tag, body)
+        self.set_header('Content-Type', ARROW_TYPE if fmt == 'arrow' else JSON_TYPE)
+        if gzipped:
+            self.set_header('Content-Encoding', 'gzip')
+        self.finish(body)
+
+    def write_error(self, status_code, **kwargs):
+        self.set_header('Content-Type', JSON_TYPE)
+        error = kwargs.get('exc_info', (None, None))[1]
+        message = getattr(error, 'log_message', None) or self._reason
+        self.finish(json.dumps({'status': status_code, 'error': message}))
+
+class CountriesHandler(QueryHandler):
+    def load(self):
+        return get_countries()
+
+class CountryHandler(QueryHandler):
+    def load(self, iso3):
+        country = country_map().get(iso3.upper())
+        if country is None:
+            return None
+        return {'iso3': country.iso3, 'country': country.country, 'region': country.region}
+
+class CountryCasesHandler(QueryHandler):
+    def load(self, iso3):
+        if iso3.upper() not in country_map():
+            return None
+        return get_cases(iso3, self.date_argument('start'), self.date_argument('end'), as_frame=True)
+
+class CasesHandler(QueryHandler):
+    def load(self):
+        start, end = self.date_argument('start', required=True), self.date_argument('end', required=True)
+        return get_cases(self.list_argument('iso3'), start, end, as_frame=True)
+
+class AggregatesHandler(QueryHandler):
+    def load(self):
+        metric = self.get_query_argument('metric', 'measles_total')
+        if metric not in CASE_COLUMNS:
+            raise tornado.web.HTTPError(400, f"unknown metric {metric!r}")
+        agg = self.get_query_argument('agg', 'sum')
+        if agg not in AGGREGATES:
+            raise tornado.web.HTTPError(400, f"unknown agg {agg!r}")
+        group_by = self.list_argument('group_by', GROUP_FIELDS) or ['date', 'region']
+        regions = self.list_argument('regions', REGION_NAMES)
+        start, end = self.date_argument('start'), self.date_argument('end')
+        date_range = (start or '1900-01-01', end or '2199-12-31') if start or end else None
+        return get_aggregated_cases(metric, regions=regions, date_range=date_range, group_by=tuple(group_by), agg=agg)
+
+class VersionHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.finish({'data_version': list(data_version()), 'response_cache': response_cache.stats()})
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        text = instrumentation.metrics_text()
+        if text is None:
+            raise tornado.web.HTTPError(404, "prometheus_client is not installed")
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.finish(text)
+
+ISO3 = r'([A-Za-z0-9-]+)'
+
+def make_app():
+    return tornado.web.Application([
+        (r'/api/countries', CountriesHandler),
+        (rf'/api/countries/{ISO3}', CountryHandler),
+        (rf'/api/countries/{ISO3}/cases', CountryCasesHandler),
+        (r'/api/cases', CasesHandler),
+        (r'/api/aggregates', AggregatesHandler),
+        (r'/api/version', VersionHandler),
+        (r'/metrics', MetricsHandler),
+    ])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the case data read-only over HTTP/JSON.")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on (SERVICE_PORT).")
+    parser.add_argument('--address', default='127.0.0.1', help="Address to bind (default: localhost only).")
+    args = parser.parse_args(argv)
+
+    make_app().listen(args.port, args.address)
+    print(f"Serving {connection.db_path()} on http://{args.address}:{args.port}/api/")
+    tornado.ioloop.IOLoop.current().start()
@@ -0,0 +1,60 @@
+import os
+
+from measles_data import connection
+from measles_data.connection import pooled
+from measles_data.models import database
+
+# Arrow IPC snapshot of the monthly table, written by the ETL next to the database
+# (measles_rubella.arrow). It is uncompressed, so readers memory-map it: numeric
+# columns are used in place, and worker processes share the same page-cache pages.
+# Each load bumps the database's user_version (the load generation), and the snapshot
+# records the generation it was written at. A reader only trusts a snapshot whose
+# generation matches the database; otherwise it falls back to SQL.
+
+FORMAT_VERSION = '1'
+
+def snapshot_path():
+    path = connection.db_path()
+    return path.with_suffix('.arrow')
+
+@pooled
+def generation():
+    return database.execute_sql('PRAGMA user_version').fetchone()[0]
+
+def bump_generation():
+    # Called by the ETL before it writes, so snapshots taken earlier stop matching
+    database.execute_sql(f'PRAGMA user_version = {generation() + 1}')
+
+def write_snapshot(path=None):
+    # Writes the current monthly table atomically; returns (path, rows)
+    import pyarrow as pa
+
+    from measles_data.queries import get_monthly_cases
+
+    path = path or snapshot_path()
+    frame = get_monthly_cases(backend='sql')
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata({
+        'format': FORMAT_VERSION,
+        'generation': str(generation()),
+    })
+    tmp_path = path.with_name(path.name + '.tmp')
+    with pa.OSFile(str(tmp_path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path, table.num_rows
+
+def read_snapshot(path=None):
+    # The monthly table from the snapshot, or None when it is missing or stale
+    import pyarrow as pa
+
+    path = path or snapshot_path()
+    if not path.exists():
+        return None
+    reader = pa.ipc.open_file(pa.memory_map(str(path)))
+    metadata = reader.schema.metadata or {}
+    if (metadata.get(b'format') != FORMAT_VERSION.encode()
+            or metadata.get(b'generation') != str(generation()).encode()):
+        return None
+    # split_blocks keeps each numeric column as its own block backed by the mapping
+    return reader.read_all().to_pandas(split_blocks=True)
@@ -0,0 +1,246 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from measles_data.models import BASE_DIR
+
+# Synthetic WHO-style extracts for scale testing. The statistics are fitted from the
+# bundled cases_month.csv / cases_year.csv: per-country case levels and populations,
+# per-region seasonal profiles, outbreak frequency/length/size, the split of totals
+# into clinical / epi-linked / lab-confirmed, the rubella ratio, discarded levels, and the
+# missing-figure patterns. Locations are sub-national units of the bundled countries
+# (iso3 "IND-007"), so regions and joins behave as they do with the real data.
+# Output is deterministic for a given seed and written as cases_month.csv /
+# cases_year.csv, which the ETL loads unchanged; --granularity week also writes
+# cases_week.csv (no month column, so the ETL's --dir mode skips it).
+# usage: python generate_synthetic.py OUT_DIR [--locations N] [--start-year Y] [--years N]
+#                                     [--granularity month|week] [--seed S]
+
+SOURCE_MONTH = BASE_DIR / 'cases_month.csv'
+SOURCE_YEAR = BASE_DIR / 'cases_year.csv'
+
+MEASLES_PARTS = ['measles_clinical', 'measles_epi_linked', 'measles_lab_confirmed']
+RUBELLA_PARTS = ['rubella_clinical', 'rubella_epi_linked', 'rubella_lab_confirmed']
+MONTH_COLUMNS = ['region', 'country', 'iso3', 'year', 'month', 'measles_suspect', 'measles_clinical',
+                 'measles_epi_linked', 'measles_lab_confirmed', 'measles_total', 'rubella_clinical',
+                 'rubella_epi_linked', 'rubella_lab_confirmed', 'rubella_total', 'discarded']
+COUNT_COLUMNS = MONTH_COLUMNS[5:]
+YEAR_COLUMNS = ['region', 'country', 'iso3', 'year', 'total_population', 'annualized_population_most_recent_year_only',
+                'total_suspected_measles_rubella_cases', 'measles_total', 'measles_lab_confirmed', 'measles_epi_linked',
+                'measles_clinical', 'measles_incidence_rate_per_1000000_total_population', 'rubella_total',
+                'rubella_lab_confirmed', 'rubella_epi_linked', 'rubella_clinical',
+                'rubella_incidence_rate_per_1000000_total_population', 'discarded_cases',
+                'discarded_non_measles_rubella_cases_per_100000_total_population']
+
+DAYS_PER_MONTH = 365.25 / 12
+DISPERSION = 0.8          # gamma-Poisson shape; lower is burstier
+OUTBREAK_FACTOR = 5       # a month counts as an outbreak above 5x the country's median month
+UNIT_SPREAD = 0.7         # std of log case level between units of one country
+
+def fit_profile(month_path=SOURCE_MONTH, year_path=SOURCE_YEAR):
+    # Statistics of the bundled extracts the generator reproduces
+    month = pd.read_csv(month_path)
+    year = pd.read_csv(year_path)
+    ordered = month.sort_values(['iso3', 'year', 'month'])
+    totals = ordered['measles_total']
+
+    # Outbreaks: runs of months above OUTBREAK_FACTOR x the country's median month. Case levels
+    # are the mean of the other months, outbreak sizes are relative to that level.
+    median = ordered.groupby('iso3')['measles_total'].transform('median').clip(lower=1)
+    outbreak = (totals > OUTBREAK_FACTOR * median).to_numpy()
+    same_country = (ordered['iso3'] == ordered['iso3'].shift()).to_numpy()
+    starts = outbreak & ~(np.roll(outbreak, 1) & same_country)
+    calm = ordered.assign(measles_total=totals.where(~outbreak))
+    per_country = calm.groupby('iso3').agg(region=('region', 'first'), country=('country', 'first'),
+                                           level=('measles_total', 'mean'), discarded=('discarded', 'mean'))
+    level = per_country['level'].reindex(ordered['iso3']).to_numpy().clip(min=1)
+    ratio = (totals.to_numpy() / level)[outbreak]
+
+    # Seasonal index per region: each country-year's months relative to its mean, averaged
+    yearly_mean = calm.groupby(['iso3', 'year'])['measles_total'].transform('mean')
+    relative = (calm['measles_total'] / yearly_mean).where(yearly_mean > 0)
+    seasonal = (calm.assign(relative=relative).groupby(['region', 'month'])['relative'].mean()
+                .unstack('month').reindex(columns=range(1, 13)).fillna(1))
+    seasonal = seasonal.div(seasonal.mean(axis=1), axis=0)
+
+    sums = month[COUNT_COLUMNS].sum()
+    return {
+        'countries': per_country,
+        'population': year.groupby('iso3')['total_population'].median().reindex(per_country.index),
+        'seasonal': seasonal,
+        'outbreak_start': starts.sum() / len(ordered),
+        'outbreak_months': outbreak.sum() / max(starts.sum(), 1),
+        'outbreak_log_ratio': (np.log(ratio).mean(), np.log(ratio).std()),
+        'measles_split': (sums[MEASLES_PARTS] / sums[MEASLES_PARTS].sum()).to_numpy(),
+        'rubella_split': (sums[RUBELLA_PARTS] / sums[RUBELLA_PARTS].sum()).to_numpy(),
+        'rubella_ratio': sums['rubella_total'] / sums['measles_total'], # rubella gets its own outbreaks
+        'measles_missing': month['measles_total'].isna().mean(),
+        'rubella_missing': month['rubella_total'].isna().mean(), # drawn per (location, year)
+    }
+
+def _locations(profile, n, rng):
+    # n sub-national units spread evenly over the bundled countries
+    countries = profile['countries']
+    parents = np.resize(rng.permutation(len(countries)), n)
+    parents.sort(kind='stable')
+    units = pd.Series(parents).groupby(parents).cumcount().to_numpy() + 1
+    per_parent = np.bincount(parents, minlength=len(countries))[parents]
+    source = countries.iloc[parents]
+    split = per_parent > 1
+    iso3 = np.where(split, source.index + '-' + pd.Series(units).map('{:03d}'.format).to_numpy(), source.index)
+    name = np.where(split, source['country'] + ' (unit ' + pd.Series(units).astype(str).to_numpy() + ')',
+                    source['country'])
+    level = np.log(source['level'].fillna(0).to_numpy() + 0.5) - np.log(per_parent)
+    level += np.where(split, rng.normal(0, UNIT_SPREAD, n), 0)
+    discarded = source['discarded'].fillna(0).to_numpy() / per_parent
+    population = profile['population'].iloc[parents].fillna(1e6).to_numpy() / per_parent
+    return pd.DataFrame({'region': source['region'].to_numpy(), 'country': name, 'iso3': iso3,
+                         'level': level, 'discarded': discarded, 'population': population})
+
+def _steps(start_year, years, granularity):
+    # Period start dates of the series
+    start, end = pd.Timestamp(start_year, 1, 1), pd.Timestamp(start_year + years, 1, 1)
+    if granularity == 'month':
+        return pd.date_range(start, end, freq='MS', inclusive='left')
+    if granularity == 'week':
+        return pd.date_range(start - pd.Timedelta(days=start.dayofweek), end, freq='W-MON', inclusive='left')
+    raise ValueError(f"unknown granularity {granularity!r}")
+
+def _outbreaks(profile, n, steps_per_month, n_steps, rng):
+    # Multiplier per (location, step): 1 outside outbreaks, a lognormal draw held for each outbreak.
+    # Measles and rubella each get their own draw, as the ratios are fitted on totals that include outbreaks.
+    p_start = profile['outbreak_start'] / steps_per_month
+    p_end = 1 / (profile['outbreak_months'] * steps_per_month)
+    mu, sigma = profile['outbreak_log_ratio']
+    multiplier = np.ones((n, n_steps))
+    current = np.ones(n)
+    active = np.zeros(n, dtype=bool)
+    for t in range(n_steps):
+        ending = active & (rng.random(n) < p_end)
+        starting = ~active & (rng.random(n) < p_start)
+        current = np.where(ending, 1, np.where(starting, np.exp(rng.normal(mu, sigma, n)), current))
+        active = (active & ~ending) | starting
+        multiplier[:, t] = current
+    return multiplier
+
+def _counts(mean, rng):
+    # Negative binomial (gamma-Poisson) counts around mean
+    return rng.poisson(rng.gamma(DISPERSION, mean / DISPERSION)).astype(np.int64)
+
+def _split(total, fractions, rng):
+    # Splits counts into len(fractions) parts that add up to total
+    parts, remaining, left = [], total, 1.0
+    for fraction in fractions[:-1]:
+        part = rng.binomial(remaining, min(fraction / left, 1.0))
+        parts.append(part)
+        remaining, left = remaining - part, left - fraction
+    return parts + [remaining]
+
+def generate(locations=193, start_year=2012, years=14, granularity='month', seed=0, profile=None):
+    # Returns (monthly, yearly, weekly-or-None) DataFrames in the WHO extract layout
+    rng = np.random.default_rng(seed)
+    profile = profile or fit_profile()
+    units = _locations(profile, locations, rng)
+    steps = _steps(start_year, years, granularity)
+    steps_per_month = 1 if granularity == 'month' else DAYS_PER_MONTH / 7
+    n, n_steps = len(units), len(steps)
+
+    seasonal = profile['seasonal'].reindex(units['region']).to_numpy()[:, steps.month - 1]
+    base = np.exp(units['level'].to_numpy())[:, None] * seasonal / steps_per_month
+    measles = _counts(base * _outbreaks(profile, n, steps_per_month, n_steps, rng), rng)
+    rubella = _counts(base * profile['rubella_ratio'] * _outbreaks(profile, n, steps_per_month, n_steps, rng), rng)
+    # discarded (tested negative) follows surveillance effort, not case levels
+    discarded = _counts(np.repeat(units['discarded'].to_numpy()[:, None] / steps_per_month, n_steps, axis=1), rng)
+
+    counts = {'measles_total': measles, 'rubella_total': rubella, 'discarded': discarded}
+    counts.update(zip(MEASLES_PARTS, _split(measles, profile['measles_split'], rng)))
+    counts.update(zip(RUBELLA_PARTS, _split(rubella, profile['rubella_split'], rng)))
+    counts['measles_suspect'] = measles + discarded
+    series = pd.DataFrame({
+        'region': np.repeat(units['region'].to_numpy(), n_steps),
+        'country': np.repeat(units['country'].to_numpy(), n_steps),
+        'iso3': np.repeat(units['iso3'].to_numpy(), n_steps),
+        'date': np.tile(steps, n),
+        **{c: counts[c].ravel() for c in COUNT_COLUMNS},
+    })
+
+    series['year'], series['month'] = series['date'].dt.year, series['date'].dt.month
+    monthly = series.groupby(['iso3', 'year', 'month'], sort=False).agg(
+        region=('region', 'first'), country=('country', 'first'), **{c: (c, 'sum') for c in COUNT_COLUMNS}
+    ).reset_index()
+    monthly = monthly[(monthly['year'] >= start_year) & (monthly['year'] < start_year + years)]
+    monthly = _with_missing(monthly, profile, rng)
+    yearly = _yearly(monthly, units, start_year)
+
+    weekly = None
+    if granularity == 'week':
+        weekly = series.drop(columns='month').rename(columns={'date': 'week_start'})
+        weekly.insert(4, 'week', weekly['week_start'].dt.isocalendar()['week'].to_numpy())
+        weekly['week_start'] = weekly['week_start'].dt.strftime('%Y-%m-%d')
+        weekly = weekly[['region', 'country', 'iso3', 'year', 'week', 'week_start'] + COUNT_COLUMNS]
+    return monthly[MONTH_COLUMNS].reset_index(drop=True), yearly, weekly
+
+def _with_missing(monthly, profile, rng):
+    # Blank measles rows and whole (location, year) blocks of rubella figures, as in the source
+    monthly = monthly.astype({c: 'float64' for c in COUNT_COLUMNS})
+    measles = [c for c in COUNT_COLUMNS if not c.startswith('rubella')]
+    monthly.loc[rng.random(len(monthly)) < profile['measles_missing'], measles] = np.nan
+    blocks = monthly.groupby(['iso3', 'year'], sort=False).ngroup().to_numpy()
+    blank = rng.random(blocks.max() + 1 if len(blocks) else 0) < profile['rubella_missing']
+    monthly.loc[blank[blocks], [c for c in COUNT_COLUMNS if c.startswith('rubella')]] = np.nan
+    return monthly.astype({c: 'Int64' for c in COUNT_COLUMNS})
+
+def _yearly(monthly, units, start_year):
+    # cases_year.csv rows consistent with the monthly counts (blank months count as 0)
+    sums = monthly.groupby(['iso3', 'year'], sort=False)[COUNT_COLUMNS].sum().astype(np.int64).reset_index()
+    info = units.set_index('iso3').loc[sums['iso3']]
+    population = np.round(info['population'].to_numpy() * 1.01 ** (sums['year'] - start_year).to_numpy()).astype(np.int64)
+    yearly = pd.DataFrame({
+        'region': info['region'].to_numpy(),
+        'country': info['country'].to_numpy(),
+        'iso3': sums['iso3'],
+        'year': sums['year'],
+        'total_population': population,
+        'annualized_population_most_recent_year_only': population,
+        'total_suspected_measles_rubella_cases': sums['measles_suspect'] + sums['rubella_total'],
+        **{c: sums[c] for c in ['measles_total', 'measles_lab_confirmed', 'measles_epi_linked', 'measles_clinical']},
+        'measles_incidence_rate_per_1000000_total_population': (sums['measles_total'] / population * 1e6).round(2),
+        **{c: sums[c] for c in ['rubella_total', 'rubella_lab_confirmed', 'rubella_epi_linked', 'rubella_clinical']},
+        'rubella_incidence_rate_per_1000000_total_population': (sums['rubella_total'] / population * 1e6).round(2),
+        'discarded_cases': sums['discarded'],
+        'discarded_non_measles_rubella_cases_per_100000_total_population': (sums['discarded'] / population * 1e5).round(2),
+    })
+    return yearly[YEAR_COLUMNS]
+
+def write_csvs(out_dir, **options):
+    # Writes cases_month.csv / cases_year.csv (and cases_week.csv) to out_dir; returns their paths
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    monthly, yearly, weekly = generate(**options)
+    paths = {'month': out_dir / 'cases_month.csv', 'year': out_dir / 'cases_year.csv'}
+    monthly.to_csv(paths['month'], index=False, na_rep='NA')
+    yearly.to_csv(paths['year'], index=False, na_rep='NA')
+    if weekly is not None:
+        paths['week'] = out_dir / 'cases_week.csv'
+        weekly.to_csv(paths['week'], index=False)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic WHO-style monthly/yearly case CSVs.")
+    parser.add_argument('out_dir', type=Path, help="Directory for cases_month.csv / cases_year.csv.")
+    parser.add_argument('--locations', type=int, default=193, help="Number of locations (sub-national units).")
+    parser.add_argument('--start-year', type=int, default=2012)
+    parser.add_argument('--years', type=int, default=14)
+    parser.add_argument('--granularity', choices=['month', 'week'], default='month',
+                        help="Simulation step; weekly series are also written to cases_week.csv.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    paths = write_csvs(args.out_dir, locations=args.locations, start_year=args.start_year, years=args.years,
+                       granularity=args.granularity, seed=args.seed)
+    for kind, path in paths.items():
+        rows = sum(1 for _ in open(path)) - 1
+        print(f"{path}: {rows:,} {kind}ly rows.")
+    print(f"Load with: CASE_CSV_DIR={args.out_dir} CASE_DB_PATH=<db> python database_create.py --bulk")
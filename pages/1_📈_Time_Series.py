@@ -1,12 +1,14 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from statsmodels.tsa.seasonal import seasonal_decompose
+from statsmodels.tsa.seasonal import DecomposeResult
 # from statsmodels.graphics.tsaplots import plot_acf
 
-from database_retrieve import get_monthly_cases
+from measles_data.queries import get_aggregated_cases
+from measles_data.cache import data_version
+from measles_data.figures import render_png
+from measles_data.instrumentation import stage
+from measles_data.decomposition import get_decomposition
 
 st.set_page_config(page_title="Time Series", page_icon="📈")
 
@@ -15,22 +17,17 @@ st.title('Time Series Plots')
 # -----------------------------------------------------------------------------
 # Load Data
 
-# cached data load
+# cached aggregate load, only the selected regions/case column are summed in SQL;
+# version is the DB data version so a refreshed database invalidates the cache
 @st.cache_data
-def load_data():
-    df = get_monthly_cases()
+def load_region_series(case_column, region_codes, version):
+    df = get_aggregated_cases(case_column, regions=region_codes, group_by=('date', 'region'))
     return df
 
-with st.spinner('Loading data...'):
-    df = load_data()
-
-data = df.copy()
-data['date'] = pd.to_datetime(data['date'])
-
 st.sidebar.success("✅ Data Loaded.")
 st.sidebar.header("Time Series Plots")
 
-# Add region_name column
+# Region codes and names
 region_mapping = {
     "AFR": "African Region",
     "AMR": "American Region",
@@ -39,7 +36,7 @@ region_mapping = {
     "EMR": "East Mediterranean Region",
     "WPR": "West Pacific Region"
 }
-data["region_name"] = data["region"].map(region_mapping)
+region_codes = {v: k for k, v in region_mapping.items()}
 all_regions = list(region_mapping.values())
 
 # -----------------------------------------------------------------------------
@@ -114,38 +111,75 @@ current_title = st.session_state.ts_active_display_name
 
 # -----------------------------------------------------------------------------
 # Time Series Plot
-if current_regions and current_column:
 
-    filtered_data = data[data["region_name"].isin(current_regions)]
+# Figures are rendered once per (regions, case column, data version) and served
+# from the shared render cache afterwards; the data is only loaded on a miss
+def load_region_frame():
+    with st.spinner('Loading data...'):
+        df_summed = load_region_series(current_column, selected_codes, data_version())
 
-    df_indexed_summed = filtered_data.groupby(['date', 'region_name'])[current_column].sum().sort_index()
+    df_plot = df_summed.pivot(index='date', columns='region', values=current_column)
+    df_plot.columns = df_plot.columns.map(region_mapping)
+    df_plot.columns.name = 'region_name'
+    df_plot = df_plot.sort_index(axis=1)
+    return df_plot
 
-    df_plot = df_indexed_summed.unstack(level='region_name')
-
-    df_plot.index = pd.to_datetime(df_plot.index)
+def build_time_series_fig():
+    df_plot = load_region_frame()
+    if df_plot.empty:
+        return None
 
     fig, ax = plt.subplots(figsize=(10, 6))
 
-    if not df_plot.empty:
-        df_plot.plot(
-            ax=ax,
-            title=f'{current_title} Over Time by Region',
-            x_compat=True 
-        )
+    df_plot.plot(
+        ax=ax,
+        title=f'{current_title} Over Time by Region',
+        x_compat=True 
+    )
 
-        locator = mdates.YearLocator()
-        ax.xaxis.set_major_locator(locator)
-        formatter = mdates.DateFormatter('%Y')
-        ax.xaxis.set_major_formatter(formatter)
+    locator = mdates.YearLocator()
+    ax.xaxis.set_major_locator(locator)
+    formatter = mdates.DateFormatter('%Y')
+    ax.xaxis.set_major_formatter(formatter)
+
+    fig.autofmt_xdate()
+
+    ax.set_ylabel('Cases Count')
+    ax.legend(title='Region')
+    fig.tight_layout()
+    return fig
+
+def build_decomposition_fig():
+    # precomputed by the ETL for single regions and the global total, memoized otherwise
+    try:
+        components = get_decomposition(current_column, selected_codes)
+    except ValueError:
+        # fewer than two years of months: nothing to draw
+        return None
+
+    decomposition = DecomposeResult(
+        observed=components['observed'].rename(None),
+        seasonal=components['seasonal'],
+        trend=components['trend'],
+        resid=components['resid']
+    )
+    decomposition_fig = decomposition.plot()
 
-        fig.autofmt_xdate()
+    decomposition_fig.set_size_inches(10, 8) 
+    decomposition_fig.tight_layout()
+    return decomposition_fig
 
-        ax.set_ylabel('Cases Count')
-        ax.legend(title='Region')
-        fig.tight_layout()
+if current_regions and current_column:
+
+    selected_codes = tuple(sorted(region_codes[name] for name in current_regions))
+    chart_params = {'regions': selected_codes, 'case_column': current_column}
+
+    time_series_png = render_png('time_series', 'time_series', chart_params, build_time_series_fig)
 
+    if time_series_png is not None:
         st.subheader(f"📈 {current_title} Time Series Plot")
-        st.pyplot(fig)
+        with stage('time_series:time_series:display'):
+            st.image(time_series_png, width='stretch')
 
     else:
         st.info("No data available for the selected criteria.")
@@ -157,16 +191,14 @@ st.markdown("---")
 # Using same region/case selection as the privous block
 st.title("Time Series Decomposition Analysis")
 
-ts_data = df_plot.sum(axis=1)
-
-decomposition = seasonal_decompose(ts_data + 1, model='multiplicative', period=12)
-decomposition_fig = decomposition.plot()
-
-decomposition_fig.set_size_inches(10, 8) 
-decomposition_fig.tight_layout()
+decomposition_png = render_png('time_series', 'decomposition', chart_params, build_decomposition_fig)
 
 st.subheader("🔬 Case Seasonal Decomposition")
-st.pyplot(decomposition_fig)
+if decomposition_png is not None:
+    with stage('time_series:decomposition:display'):
+        st.image(decomposition_png, width='stretch')
+else:
+    st.info("Seasonal decomposition needs at least 24 months of data.")
 
 st.markdown("---")
 
@@ -1,25 +1,17 @@
 import streamlit as st
-import numpy as np
 import pandas as pd
 import plotly.express as px
-from database_retrieve import get_monthly_cases
+from measles_data.cache import get_dataset
+from measles_data.figures import render_plotly
+from measles_data.instrumentation import stage
 
 st.set_page_config(page_title="Global Measles Map", page_icon="🌍")
 
 st.title('Global Measles Map')
 
-# cached data load
-@st.cache_data
-def load_data():
-    df = get_monthly_cases()
-    return df
-
+# shared process-wide dataset; .copy() before modifying values
 with st.spinner('Loading data...'):
-    df = load_data()
-
-data = df.copy() # Deep Copy
-
-data['date'] = pd.to_datetime(data['date'])
+    data = get_dataset()
 
 st.sidebar.success("✅ Data Loaded.")
 st.sidebar.header("Static Global Map")
@@ -66,94 +58,102 @@ with st.form("query_form"):
     submitted = st.form_submit_button("Submit")
 
 if submitted:
-    # only runs after submit
-    # target column
-    if selected_disease == "Measles":
-        target_column = "measles_total"
-        display_name = "Measles Cases"
-    else:
-        target_column = "rubella_total"
-        display_name = "Rubella Cases"
-
-    # subsetting data
-    target_date_str = f"{selected_year}-{int(selected_month):02d}-01"
-    CONDITIONS = (data['date'] == pd.to_datetime(target_date_str)) & \
-                (data[target_column].notna())
-    
-    COLUMNS = ["country", "iso3", target_column]
-
-    filtered_data = data.loc[CONDITIONS, COLUMNS].copy()
-
-    # upper bound for levels
-    current_max = filtered_data[target_column].max()
-    if pd.isna(current_max): # incase of NaN
-        current_max = 0
-
-
-    # generate binned category
-    upper_bound = max(1001, current_max + 1)
-    
-    bins = [0, 50, 200, 1000, upper_bound]
-    labels = ["0-50", "50-200", "200-1000", "1000+"]
-
-    filtered_data["category"] = pd.cut(
-        filtered_data[target_column], 
-        bins=bins, 
-        labels=labels, 
-        right=True,
-        include_lowest=True
-    )
-
-    # offsetting small points
-    filtered_data['visible_size'] = filtered_data[target_column] + offset
-
-    # set scope and projection to lower cases
-    scope_param = selected_scope.lower()
-    proj_param = selected_proj.lower()
-
-    # map
-    fig = px.scatter_geo(
-        filtered_data,
-        locations = "iso3",
-        locationmode = "ISO-3",
-
-        size = "visible_size",
-        size_max = 50,
-
-        color = "category",
-        # color_continuous_scale = "Reds",
-        # range_color = [0, 1000],
-        color_discrete_map = color_map_reds,
-        category_orders = {"category": ["0-50", "50-200", "200-1000", "1000+"]},
-
-        labels = {
-            "category": "Level",
-            target_column: display_name,
-            "iso3": "ISO-3"
-            },
-        hover_name = "country",
-
-        custom_data = [target_column, "category"],
-
-        projection = proj_param,
-        scope = scope_param,
-        
-        title = f"Global {selected_disease} Cases by Level ({selected_year}-{selected_month})"
-    )
-
-    # hover information
-    template = (
-        '<b>%{hovertext}</b><br>' + 
-        '<br>' +
-        f'{selected_disease}: %{{customdata[0]:,}}<br>' +
-        'Level: %{customdata[1]}<extra></extra>'
-    )
-
-    fig.update_traces(
-        hovertemplate=template
-    )
-
-    st.plotly_chart(fig)
+    # the figure JSON is built once per settings and data version, then served
+    # from the shared render cache
+    def build_map_fig():
+        # only runs after submit
+        # target column
+        if selected_disease == "Measles":
+            target_column = "measles_total"
+            display_name = "Measles Cases"
+        else:
+            target_column = "rubella_total"
+            display_name = "Rubella Cases"
+
+        # subsetting data
+        target_date_str = f"{selected_year}-{int(selected_month):02d}-01"
+        CONDITIONS = (data['date'] == pd.to_datetime(target_date_str)) & \
+                    (data[target_column].notna())
+
+        COLUMNS = ["country", "iso3", target_column]
+
+        filtered_data = data.loc[CONDITIONS, COLUMNS].copy()
+
+        # upper bound for levels
+        current_max = filtered_data[target_column].max()
+        if pd.isna(current_max): # incase of NaN
+            current_max = 0
+
+
+        # generate binned category
+        upper_bound = max(1001, current_max + 1)
+
+        bins = [0, 50, 200, 1000, upper_bound]
+        labels = ["0-50", "50-200", "200-1000", "1000+"]
+
+        filtered_data["category"] = pd.cut(
+            filtered_data[target_column], 
+            bins=bins, 
+            labels=labels, 
+            right=True,
+            include_lowest=True
+        )
+
+        # offsetting small points
+        filtered_data['visible_size'] = filtered_data[target_column] + offset
+
+        # set scope and projection to lower cases
+        scope_param = selected_scope.lower()
+        proj_param = selected_proj.lower()
+
+        # map
+        fig = px.scatter_geo(
+            filtered_data,
+            locations = "iso3",
+            locationmode = "ISO-3",
+
+            size = "visible_size",
+            size_max = 50,
+
+            color = "category",
+            # color_continuous_scale = "Reds",
+            # range_color = [0, 1000],
+            color_discrete_map = color_map_reds,
+            category_orders = {"category": ["0-50", "50-200", "200-1000", "1000+"]},
+
+            labels = {
+                "category": "Level",
+                target_column: display_name,
+                "iso3": "ISO-3"
+                },
+            hover_name = "country",
+
+            custom_data = [target_column, "category"],
+
+            projection = proj_param,
+            scope = scope_param,
+
+            title = f"Global {selected_disease} Cases by Level ({selected_year}-{selected_month})"
+        )
+
+        # hover information
+        template = (
+            '<b>%{hovertext}</b><br>' + 
+            '<br>' +
+            f'{selected_disease}: %{{customdata[0]:,}}<br>' +
+            'Level: %{customdata[1]}<extra></extra>'
+        )
+
+        fig.update_traces(
+            hovertemplate=template
+        )
+        return fig
+
+    map_params = {'year': selected_year, 'month': selected_month, 'scope': selected_scope,
+                  'projection': selected_proj, 'disease': selected_disease}
+    map_json = render_plotly('static_map', 'map', map_params, build_map_fig)
+    with stage('static_map:map:display'):
+        st.plotly_chart(map_json)
 
 
 if st.checkbox('Show raw data'):
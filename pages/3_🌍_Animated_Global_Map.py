@@ -1,25 +1,16 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
-import plotly.express as px
-from database_retrieve import get_monthly_cases
+from measles_data.cache import get_dataset
+from measles_data.animation import frame_grid, frame_step, build_figure
+from measles_data.figures import render_plotly
+from measles_data.instrumentation import stage
 
 st.set_page_config(page_title="Global Measles Map", page_icon="🌍")
 
 st.title('Animated Global Map')
 
-# cached data load
-@st.cache_data
-def load_data():
-    df = get_monthly_cases()
-    return df
-
+# shared process-wide dataset; .copy() before modifying values
 with st.spinner('Loading data...'):
-    df = load_data()
-
-data = df.copy() # Deep Copy
-
-data['date'] = pd.to_datetime(data['date'])
+    data = get_dataset()
 
 st.sidebar.success("✅ Data Loaded.")
 st.sidebar.header("Global Spread Animation")
@@ -29,17 +20,6 @@ st.sidebar.markdown(
     """
 )
 
-# plot configure
-offset = 20
-
-# category for color mapping
-color_map_reds = {
-    "0-50": "#F1948A",
-    "50-200": "#E74C3C",
-    "200-1000": "#C0392B",
-    "1000+": "#78281F"
-}
-
 # user input
 with st.form("query_form"):
     st.write("Configuration")
@@ -66,6 +46,9 @@ with st.form("query_form"):
         max_value=max_year, 
         value=(min_year, max_year)
     )
+
+    # Auto steps by month up to 5 years, then by quarter or year to keep the frame count down
+    selected_step = st.selectbox("Frame Step", ["Auto", "Month", "Quarter", "Year"], index=0)
     
     submitted = st.form_submit_button("Submit")
 
@@ -74,99 +57,35 @@ if submitted:
     # target column
     if selected_disease == "Measles":
         target_column = "measles_total"
-        display_name = "Measles Cases"
     else:
         target_column = "rubella_total"
-        display_name = "Rubella Cases"
 
     start_year, end_year = selected_years
-
-    # subsetting data
-    CONDITIONS = (data["date"] >= pd.to_datetime(f"{start_year}-01-01")) & \
-                (data["date"] <= pd.to_datetime(f"{end_year}-12-31")) & \
-                (data[target_column].notna())
-    
-    COLUMNS = ["country", "iso3", "date", target_column]
-
-    filtered_data = data.loc[CONDITIONS, COLUMNS].copy()
-
-    filtered_data = filtered_data.sort_values("date")
-
-    # upper bound for levels
-    current_max = filtered_data[target_column].max()
-
-    if pd.isna(current_max): # incase of NaN
-        current_max = 0
-
-    # generate binned category
-    upper_bound = max(1001, current_max + 1)
-    
-    bins = [0, 50, 200, 1000, upper_bound]
-    labels = ["0-50", "50-200", "200-1000", "1000+"]
-
-    filtered_data["category"] = pd.cut(
-        filtered_data[target_column], 
-        bins=bins, 
-        labels=labels, 
-        right=True,
-        include_lowest=True
-    )
-
-    # offsetting small points
-    filtered_data['visible_size'] = filtered_data[target_column] + offset
-
-    # set scope and projection to lower cases
-    scope_param = selected_scope.lower()
-    proj_param = selected_proj.lower()
-
-    # map
-    fig = px.scatter_geo(
-        filtered_data,
-        locations = "iso3",
-        locationmode = "ISO-3",
-
-        # animation configure
-        animation_frame = "date", # play by time
-        animation_group = "iso3", # transit by country
-
-        size = "visible_size",
-        size_max = 50,
-
-        color = "category",
-        # color_continuous_scale = "Reds",
-        # range_color = [0, 1000],
-        color_discrete_map = color_map_reds,
-        category_orders = {"category": ["0-50", "50-200", "200-1000", "1000+"]},
-
-        labels = {
-            "category": "Level",
-            target_column: display_name,
-            "iso3": "ISO-3",
-            "date": "Time"
-            },
-        hover_name = "country",
-
-        custom_data = [target_column, "category"],
-
-        projection = proj_param,
-        scope = scope_param,
-        
-        title = f"Global {selected_disease} Cases by Level ({start_year}-{end_year})"
-    )
-
-    # hover information
-    template = (
-        '<b>%{hovertext}</b><br>' + 
-        '<br>' +
-        f'{selected_disease}: %{{customdata[0]:,}}<br>' +
-        'Level: %{customdata[1]}<extra></extra>'
-    )
-
-    fig.update_traces(hovertemplate=template)
-    fig.update_layout(margin={"r":0,"t":50,"l":0,"b":0})
-
-    st.plotly_chart(fig)
-
+    if selected_step == "Auto":
+        step = frame_step(start_year, end_year)
+    else:
+        step = selected_step.lower()
+
+    # levels and sizes come precomputed from the frame engine; the figure JSON is
+    # built once per settings and data version, then served from the render cache
+    def build_map_fig():
+        grid = frame_grid(target_column, start_year, end_year, step)
+        return build_figure(
+            grid,
+            disease=selected_disease,
+            scope=selected_scope.lower(),
+            projection=selected_proj.lower(),
+            title=f"Global {selected_disease} Cases by Level ({start_year}-{end_year}, by {step})"
+        )
+
+    map_params = {'years': tuple(selected_years), 'step': step, 'scope': selected_scope,
+                  'projection': selected_proj, 'disease': selected_disease}
+    map_json = render_plotly('animated_map', 'map', map_params, build_map_fig)
+    if map_json is not None:
+        with stage('animated_map:map:display'):
+            st.plotly_chart(map_json)
+    else:
+        st.info("No data available for the selected criteria.")
 
 if st.checkbox('Show raw data'):
     st.subheader('Raw data')
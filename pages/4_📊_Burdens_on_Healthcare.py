@@ -1,8 +1,8 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
-import seaborn as sns
 import plotly.express as px
+from measles_data.queries import get_top_incidence, get_bottom_lab_confirmed_ratio
+from measles_data.cache import data_version
+from measles_data.instrumentation import stage
 
 st.set_page_config(page_title="Healthcare Capacity", page_icon="📊")
 
@@ -10,18 +10,20 @@ st.title("Burdens of Measles on Healthcare")
 
 # -----------------------------------------------------------------------------
 # Load Data
-DATA_PATH = ('cases_year.csv')
 
-# cached data load
+# cached rankings, medians and ranks are computed in SQL from the yearly_stats table;
+# version is the DB data version so a refreshed database invalidates the cache
 @st.cache_data
-def load_data(path):
-    df = pd.read_csv(path)
-    return df
+def load_top_incidence(version, n=20):
+    return get_top_incidence(n)
 
-with st.spinner('Loading data...'):
-    df = load_data(DATA_PATH)
+@st.cache_data
+def load_bottom_lab_confirmed_ratio(version, n=20):
+    return get_bottom_lab_confirmed_ratio(n)
 
-data = df.copy() # Deep Copy
+with st.spinner('Loading data...'), stage('healthcare:prep'):
+    top20, df_subset = load_top_incidence(data_version())
+    bottom20, df_ratio_plot = load_bottom_lab_confirmed_ratio(data_version())
 
 st.sidebar.success("✅ Data Loaded.")
 st.sidebar.header("Burdens on Healthcare")
@@ -32,45 +34,28 @@ st.sidebar.markdown(
     """
 )
 
-# Add region_name column
-region_mapping = {
-    "AFR": "African Region",
-    "AMR": "American Region",
-    "SEAR": "South-East Asian Region",
-    "EUR": "European Region",
-    "EMR": "East Mediterranean Region",
-    "WPR": "West Pacific Region"
-}
-data["region_name"] = data["region"].map(region_mapping)
-
 #------------------------------------------------------------------------------
 # Top 20 countries by median measles incidence
-target_column = "measles_incidence_rate_per_1000000_total_population"
-
-top20 = data.groupby("country")[target_column].median().sort_values(ascending=False).head(20).index
-
-df_subset = data[data['country'].isin(top20)].copy()
-
-df_subset.rename(columns={target_column: 'measles_per1M'}, inplace=True)
 
 # Boxplot
 
-fig = px.box(
-    df_subset, 
-    x="measles_per1M", 
-    y="country",
-    title="<b>Top 20 Countries by Median Measles Incidence</b><br><sup>Hover over points to see outbreak years</sup>",
+with stage('healthcare:incidence:build'):
+    fig = px.box(
+        df_subset, 
+        x="measles_per1M", 
+        y="country",
+        title="<b>Top 20 Countries by Median Measles Incidence</b><br><sup>Hover over points to see outbreak years</sup>",
     
-    category_orders={"country": top20}, 
+        category_orders={"country": top20}, 
     
-    hover_name="country",
-    # hover_data=["year", "measles_total", "total_population"],
-    custom_data = ["year", "measles_total", "total_population", "measles_per1M"],
+        hover_name="country",
+        # hover_data=["year", "measles_total", "total_population"],
+        custom_data = ["year", "measles_total", "total_population", "measles_per1M"],
     
-    points="outliers",
-    orientation="h",
-    height=800
-)
+        points="outliers",
+        orientation="h",
+        height=800
+    )
 
 # hover information
 template = (
@@ -91,34 +76,28 @@ fig.update_layout(
     hovermode="closest"
 )
 
-st.plotly_chart(fig)
+with stage('healthcare:incidence:display'):
+    st.plotly_chart(fig)
 
 #------------------------------------------------------------------------------
 # Bottom 20 Countries By Laboratory Confirmed Case Ratio
 
-df_ratio = data[data['measles_total'] > 0].copy()
-
-df_ratio['lab_confirmed_ratio'] = df_ratio['measles_lab_confirmed'] / df_ratio['measles_total']
-
-bottom20 = df_ratio.groupby("country")['lab_confirmed_ratio'].median().sort_values(ascending=True).head(20).index
-
-df_ratio_plot = df_ratio[df_ratio["country"].isin(bottom20)].copy()
-
-fig2 = px.box(
-    df_ratio_plot, 
-    x="lab_confirmed_ratio", 
-    y="country",
-    title="<b>Bottom 20 Countries by Laboratory Confirmed Case Ratio</b><br><sup>Hover over points to check outliers</sup>",
+with stage('healthcare:lab_ratio:build'):
+    fig2 = px.box(
+        df_ratio_plot, 
+        x="lab_confirmed_ratio", 
+        y="country",
+        title="<b>Bottom 20 Countries by Laboratory Confirmed Case Ratio</b><br><sup>Hover over points to check outliers</sup>",
     
-    category_orders={"country": bottom20}, 
+        category_orders={"country": bottom20}, 
     
-    hover_name="country",
-    custom_data = ["year", "measles_total", "total_population", "lab_confirmed_ratio"],
+        hover_name="country",
+        custom_data = ["year", "measles_total", "total_population", "lab_confirmed_ratio"],
     
-    points="all",
-    orientation="h",
-    height=800
-)
+        points="all",
+        orientation="h",
+        height=800
+    )
 
 template2 = (
     '<b>%{hovertext}</b><br>' + 
@@ -138,4 +117,5 @@ fig2.update_layout(
     hovermode="closest"
 )
 
-st.plotly_chart(fig2)
\ No newline at end of file
+with stage('healthcare:lab_ratio:display'):
+    st.plotly_chart(fig2)
\ No newline at end of file
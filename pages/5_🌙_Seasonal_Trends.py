@@ -1,34 +1,18 @@
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import numpy as np
-from database_retrieve import get_monthly_cases
+from measles_data.seasonal import get_seasonal_stats
+from measles_data.figures import render_png
+from measles_data.instrumentation import stage
 
 st.set_page_config(page_title="Seasonal Trends", page_icon="🌙")
 
 st.title('Seasonal Trends Analysis')
 
-# ------------------------------------
-# Load Data
-@st.cache_data
-def load_data():
-    df = get_monthly_cases()
-    return df
-
-with st.spinner('Loading data...'):
-    df = load_data()
-
-data = df.copy()
-data['date'] = pd.to_datetime(data['date'])
-data['month'] = data['date'].dt.month
-data['year'] = data['date'].dt.year
-data['month_name'] = data['date'].dt.strftime('%B')
-
 st.sidebar.success("✅ Data Loaded.")
 st.sidebar.header("Seasonal Trends")
 
-# Add region_name column
+# Region names (region_name column is precomputed in the shared dataset)
 region_mapping = {
     "AFR": "African Region",
     "AMR": "American Region",
@@ -37,7 +21,7 @@ region_mapping = {
     "EMR": "East Mediterranean Region",
     "WPR": "West Pacific Region"
 }
-data["region_name"] = data["region"].map(region_mapping)
+region_codes = {v: k for k, v in region_mapping.items()}
 all_regions = list(region_mapping.values())
 
 # Initialize Session States
@@ -100,118 +84,132 @@ if submit_button:
 current_regions = st.session_state.seasonal_regions
 current_column = st.session_state.seasonal_case_column
 current_title = st.session_state.seasonal_display_name
+selected_codes = tuple(sorted(region_codes[name] for name in current_regions))
+# Figures below are rendered once per (regions, case column, data version) and then
+# served from the shared render cache
+chart_params = {'regions': selected_codes, 'case_column': current_column}
+
+# ------------------------------------
+# Load Data
+# every chart and table below shares one grouped pass over a (region, year, month) cube,
+# memoized per selection and DB data version
+with st.spinner('Loading data...'):
+    seasonal_stats = get_seasonal_stats(current_column, selected_codes)
 
 # ------------------------------------
 # Seasonal Heatmap by Month
 if current_regions and current_column:
     st.subheader(f"🔥 Seasonal Heatmap: {current_title} by Month and Year")
     
-    filtered_data = data[data["region_name"].isin(current_regions)]
-    
-    # Aggregate by month and year
-    seasonal_data = filtered_data.groupby(['year', 'month'])[current_column].sum().reset_index()
-    seasonal_pivot = seasonal_data.pivot(index='month', columns='year', values=current_column)
+    def build_heatmap_fig():
+        # Sums by month and year
+        seasonal_pivot = seasonal_stats['heatmap']
+        
+        # Create heatmap
+        fig, ax = plt.subplots(figsize=(14, 6))
+        sns.heatmap(seasonal_pivot, annot=False, fmt='.0f', cmap='YlOrRd', ax=ax, cbar_kws={'label': 'Cases Count'})
+        ax.set_xlabel('Year')
+        ax.set_ylabel('Month')
+        ax.set_yticklabels(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], rotation=0)
+        return fig
     
-    # Create heatmap
-    fig, ax = plt.subplots(figsize=(14, 6))
-    sns.heatmap(seasonal_pivot, annot=False, fmt='.0f', cmap='YlOrRd', ax=ax, cbar_kws={'label': 'Cases Count'})
-    ax.set_xlabel('Year')
-    ax.set_ylabel('Month')
-    ax.set_yticklabels(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], rotation=0)
+    heatmap_png = render_png('seasonal_trends', 'heatmap', chart_params, build_heatmap_fig)
     
-    st.pyplot(fig)
+    with stage('seasonal_trends:heatmap:display'):
+        st.image(heatmap_png, width='stretch')
 
 # ------------------------------------
 # Average Monthly Pattern
 if current_regions and current_column:
     st.subheader(f"📊 Average Monthly Pattern: {current_title}")
     
-    filtered_data = data[data["region_name"].isin(current_regions)]
-    
-    # Calculate average cases per month across all years
-    monthly_avg = filtered_data.groupby('month')[current_column].mean().reset_index()
-    
-    fig, ax = plt.subplots(figsize=(12, 6))
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    ax.bar(range(1, 13), monthly_avg[current_column].values, color='steelblue', edgecolor='black')
-    ax.set_xlabel('Month')
-    ax.set_ylabel('Average Cases Count')
-    ax.set_title(f'Average {current_title} by Month (Across All Years)')
-    ax.set_xticks(range(1, 13))
-    ax.set_xticklabels(months)
-    ax.grid(axis='y', alpha=0.3)
-    
-    st.pyplot(fig)
+    def build_monthly_mean_fig():
+        # Average cases per month across all years
+        monthly_avg = seasonal_stats['monthly_mean']
+        
+        fig, ax = plt.subplots(figsize=(12, 6))
+        months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+        ax.bar(range(1, 13), monthly_avg.values, color='steelblue', edgecolor='black')
+        ax.set_xlabel('Month')
+        ax.set_ylabel('Average Cases Count')
+        ax.set_title(f'Average {current_title} by Month (Across All Years)')
+        ax.set_xticks(range(1, 13))
+        ax.set_xticklabels(months)
+        ax.grid(axis='y', alpha=0.3)
+        return fig
+    
+    monthly_mean_png = render_png('seasonal_trends', 'monthly_mean', chart_params, build_monthly_mean_fig)
+    
+    with stage('seasonal_trends:monthly_mean:display'):
+        st.image(monthly_mean_png, width='stretch')
 
 # ------------------------------------
 # Monthly Box Plot (Distribution across years)
 if current_regions and current_column:
     st.subheader(f"📦 Monthly Distribution: {current_title}")
     
-    filtered_data = data[data["region_name"].isin(current_regions)]
-    
-    fig, ax = plt.subplots(figsize=(12, 6))
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    
-    # Prepare data for box plot
-    box_data = [filtered_data[filtered_data['month'] == i][current_column].values for i in range(1, 13)]
-    
-    bp = ax.boxplot(box_data, labels=months, patch_artist=True)
-    
-    # Color the boxes
-    for patch in bp['boxes']:
-        patch.set_facecolor('lightblue')
-    
-    ax.set_xlabel('Month')
-    ax.set_ylabel('Cases Count')
-    ax.set_title(f'Distribution of {current_title} by Month (Box Plot)')
-    ax.grid(axis='y', alpha=0.3)
-    
-    st.pyplot(fig)
+    def build_boxplot_fig():
+        fig, ax = plt.subplots(figsize=(12, 6))
+        months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+        
+        # Values of each month, January first
+        box_data = seasonal_stats['by_month']
+        
+        bp = ax.boxplot(box_data, labels=months, patch_artist=True)
+        
+        # Color the boxes
+        for patch in bp['boxes']:
+            patch.set_facecolor('lightblue')
+        
+        ax.set_xlabel('Month')
+        ax.set_ylabel('Cases Count')
+        ax.set_title(f'Distribution of {current_title} by Month (Box Plot)')
+        ax.grid(axis='y', alpha=0.3)
+        return fig
+    
+    boxplot_png = render_png('seasonal_trends', 'boxplot', chart_params, build_boxplot_fig)
+    
+    with stage('seasonal_trends:boxplot:display'):
+        st.image(boxplot_png, width='stretch')
 
 # ------------------------------------
 # Regional Comparison - Seasonal Pattern
 if current_regions and current_column:
     st.subheader(f"🌍 Regional Seasonal Patterns: {current_title}")
     
-    filtered_data = data[data["region_name"].isin(current_regions)]
-    
-    # Calculate average for each region and month
-    regional_seasonal = filtered_data.groupby(['region_name', 'month'])[current_column].mean().reset_index()
-    
-    fig, ax = plt.subplots(figsize=(14, 7))
-    
-    for region in current_regions:
-        region_data = regional_seasonal[regional_seasonal['region_name'] == region]
-        ax.plot(region_data['month'], region_data[current_column], marker='o', label=region, linewidth=2)
-    
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    ax.set_xlabel('Month')
-    ax.set_ylabel('Average Cases Count')
-    ax.set_title(f'Regional Comparison: {current_title} Seasonal Pattern')
-    ax.set_xticks(range(1, 13))
-    ax.set_xticklabels(months)
-    ax.legend(title='Region')
-    ax.grid(True, alpha=0.3)
-    
-    st.pyplot(fig)
+    def build_regional_fig():
+        # Average for each region and month (month x region code)
+        regional_seasonal = seasonal_stats['regional_mean']
+        
+        fig, ax = plt.subplots(figsize=(14, 7))
+        
+        for region in current_regions:
+            region_data = regional_seasonal[region_codes[region]].dropna()
+            ax.plot(region_data.index, region_data.values, marker='o', label=region, linewidth=2)
+        
+        months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+        ax.set_xlabel('Month')
+        ax.set_ylabel('Average Cases Count')
+        ax.set_title(f'Regional Comparison: {current_title} Seasonal Pattern')
+        ax.set_xticks(range(1, 13))
+        ax.set_xticklabels(months)
+        ax.legend(title='Region')
+        ax.grid(True, alpha=0.3)
+        return fig
+    
+    # legend order follows the selection order, so it is part of the key
+    regional_params = dict(chart_params, region_order=tuple(current_regions))
+    regional_png = render_png('seasonal_trends', 'regional', regional_params, build_regional_fig)
+    with stage('seasonal_trends:regional:display'):
+        st.image(regional_png, width='stretch')
 
 # ------------------------------------
 # Statistics Table
 if current_regions and current_column:
     st.subheader(f"📈 Seasonal Statistics: {current_title}")
     
-    filtered_data = data[data["region_name"].isin(current_regions)]
-    
-    # Calculate statistics per month
-    stats_by_month = filtered_data.groupby('month')[current_column].agg([
-        ('Mean', 'mean'),
-        ('Median', 'median'),
-        ('Std Dev', 'std'),
-        ('Min', 'min'),
-        ('Max', 'max'),
-        ('Count', 'count')
-    ]).round(2)
+    # Statistics per month
+    stats_by_month = seasonal_stats['month_stats'].round(2)
     
     months = ['January', 'February', 'March', 'April', 'May', 'June', 
               'July', 'August', 'September', 'October', 'November', 'December']
@@ -224,19 +222,21 @@ if current_regions and current_column:
 if current_regions and current_column:
     st.subheader("📍 Peak and Trough Months")
     
-    filtered_data = data[data["region_name"].isin(current_regions)]
-    monthly_avg = filtered_data.groupby('month')[current_column].mean()
+    monthly_avg = seasonal_stats['monthly_mean']
     
-    peak_month = monthly_avg.idxmax()
-    trough_month = monthly_avg.idxmin()
+    peak_month = seasonal_stats['peak_month']
+    trough_month = seasonal_stats['trough_month']
     
     months = ['January', 'February', 'March', 'April', 'May', 'June', 
               'July', 'August', 'September', 'October', 'November', 'December']
     
-    col1, col2 = st.columns(2)
-    with col1:
-        st.metric(label="🔴 Peak Month", value=months[peak_month-1], delta=f"{monthly_avg[peak_month]:.0f} avg cases")
-    with col2:
-        st.metric(label="🔵 Trough Month", value=months[trough_month-1], delta=f"{monthly_avg[trough_month]:.0f} avg cases")
+    if peak_month is None:
+        st.info("No data available for the selected criteria.")
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric(label="🔴 Peak Month", value=months[peak_month-1], delta=f"{monthly_avg[peak_month]:.0f} avg cases")
+        with col2:
+            st.metric(label="🔵 Trough Month", value=months[trough_month-1], delta=f"{monthly_avg[trough_month]:.0f} avg cases")
 
 
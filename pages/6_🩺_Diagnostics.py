@@ -0,0 +1,76 @@
+import streamlit as st
+from measles_data import instrumentation
+from measles_data.figures import figure_cache
+
+st.set_page_config(page_title="Diagnostics", page_icon="🩺")
+
+st.title('Diagnostics')
+
+st.sidebar.header("Diagnostics")
+st.sidebar.markdown(
+    """
+    Timings of the **data prep, figure build / serialization and display** stages
+    and of every **SQL query** run by this server process.
+    """
+)
+
+# -----------------------------------------------------------------------------
+# Recording switch (process-wide; CASE_INSTRUMENT=1 turns it on at startup)
+
+recording = st.sidebar.toggle("Record timings", value=instrumentation.is_enabled())
+if recording != instrumentation.is_enabled():
+    instrumentation.enable() if recording else instrumentation.disable()
+
+if st.sidebar.button("Clear recorded timings"):
+    instrumentation.reset()
+
+if not instrumentation.is_enabled():
+    st.info("Timing is off. Turn on **Record timings** (or start the app with `CASE_INSTRUMENT=1`), "
+            "then use the other pages and come back here.")
+
+records = instrumentation.records()
+st.caption(f"{len(records)} recent timings kept (ring buffer of {instrumentation.BUFFER_SIZE}).")
+
+# -----------------------------------------------------------------------------
+# Stages
+
+st.subheader("⏱️ Stages")
+stages = instrumentation.summary('stage')
+if stages.empty:
+    st.write("No stages recorded yet.")
+else:
+    st.bar_chart(stages.set_index('name')[['p50_ms', 'p95_ms']].head(15), horizontal=True)
+    st.dataframe(stages.drop(columns='kind'), hide_index=True,
+                 column_config={c: st.column_config.NumberColumn(format="%.1f") for c in stages.columns if c.endswith('_ms')})
+
+# -----------------------------------------------------------------------------
+# Queries
+
+st.subheader("🗄️ Queries")
+queries = instrumentation.summary('query')
+if queries.empty:
+    st.write("No queries recorded yet.")
+else:
+    st.dataframe(queries.drop(columns='kind'), hide_index=True,
+                 column_config={c: st.column_config.NumberColumn(format="%.1f") for c in queries.columns if c.endswith('_ms')})
+    st.markdown("**Slowest queries**")
+    st.dataframe(instrumentation.slowest_queries(20), hide_index=True,
+                 column_config={'ms': st.column_config.NumberColumn(format="%.1f")})
+
+# -----------------------------------------------------------------------------
+# Render cache
+
+st.subheader("🖼️ Render Cache")
+cache_stats = figure_cache.stats()
+lookups = cache_stats['hits'] + cache_stats['misses']
+col1, col2, col3 = st.columns(3)
+col1.metric("Entries", cache_stats['entries'])
+col2.metric("Size", f"{cache_stats['bytes'] / 1e6:.1f} / {cache_stats['budget'] / 1e6:.0f} MB")
+col3.metric("Hit rate", f"{cache_stats['hits'] / lookups:.0%}" if lookups else "–")
+
+if st.checkbox('Show recent timings'):
+    st.dataframe(records.iloc[::-1], hide_index=True)
+
+if st.checkbox('Show Prometheus metrics'):
+    metrics = instrumentation.metrics_text()
+    st.code(metrics.decode() if metrics else "prometheus_client is not installed.", language='text')
@@ -0,0 +1,12 @@
+from measles_data.animation import build_figure, frame_grid
+
+def test_years_without_figures_build_no_figure():
+    grid = frame_grid('measles_total', 1990, 1991, 'year')
+    assert grid['iso3'] == [] and grid['sizeref'] > 0
+    assert build_figure(grid, 'Measles', 'world', 'natural earth', 'empty') is None
+
+def test_selected_years_build_one_frame_per_step():
+    grid = frame_grid('measles_total', 2019, 2020, 'year')
+    fig = build_figure(grid, 'Measles', 'world', 'natural earth', '2019-2020')
+    assert [frame.name for frame in fig.frames] == ['2019', '2020']
+    assert grid['sizeref'] > 0
@@ -0,0 +1,10 @@
+import pandas as pd
+
+from measles_data.compact import load_compact
+from measles_data.models import BASE_DIR, CASE_COLUMNS
+
+def test_metric_subsets_keep_the_blank_cells_of_the_csv():
+    blanks = pd.read_csv(BASE_DIR / 'cases_month.csv', usecols=CASE_COLUMNS).isna().sum()
+    for metrics in (['rubella_total'], ['discarded', 'measles_suspect'], CASE_COLUMNS[::-1]):
+        frame = load_compact(metrics=metrics)
+        assert frame[metrics].isna().sum().to_dict() == blanks[metrics].to_dict()
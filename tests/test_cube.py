@@ -0,0 +1,13 @@
+import numpy as np
+import pytest
+
+from measles_data.cube import get_cube
+
+def test_rolling_window_bounds():
+    cube = get_cube()
+    months = len(cube.dates)
+    assert np.isnan(cube.rolling('measles_total', months + 1)).all()
+    full = cube.rolling('measles_total', months, 'IND')
+    assert np.isnan(full[:-1]).all() and full[-1] == pytest.approx(cube.slice('measles_total', 'IND').mean())
+    with pytest.raises(ValueError, match="positive"):
+        cube.rolling('measles_total', 0)
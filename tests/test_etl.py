@@ -0,0 +1,105 @@
+import pandas as pd
+import pytest
+
+from measles_data import connection, etl
+from measles_data.decomposition import get_decomposition, REGIONS
+from measles_data.models import CaseData, SeasonalDecomposition
+from measles_data.queries import get_aggregated_cases
+from measles_data.synthetic import write_csvs
+
+@pytest.fixture
+def database_dir(tmp_path, monkeypatch):
+    # A temporary database that the ETL loads from the CSVs next to it
+    monkeypatch.setattr(etl, 'CSV_DIR', tmp_path)
+    previous = connection.db_path(), connection.is_read_only()
+    connection.configure(tmp_path / 'measles_rubella.db', read_only=False)
+    yield tmp_path
+    connection.configure(*previous)
+
+def test_short_dataset_loads_without_decompositions(database_dir, capsys):
+    write_csvs(database_dir, locations=20, years=1, seed=1)
+    etl.main([])
+    output = capsys.readouterr().out
+    assert "Seasonal decompositions: skipped." in output
+    assert (database_dir / 'measles_rubella.arrow').exists()
+    assert not SeasonalDecomposition.select().exists()
+
+    with pytest.raises(ValueError, match="at least 24 months"):
+        get_decomposition('measles_total', REGIONS)
+
+def _region_totals(use_rollups):
+    totals = get_aggregated_cases('measles_total', group_by=('date', 'region'), use_rollups=use_rollups)
+    return totals.sort_values(['date', 'region'], ignore_index=True)
+
+def test_region_change_moves_rollup_totals(database_dir):
+    paths = write_csvs(database_dir, locations=12, years=3, seed=1)
+    etl.load_incremental(paths['year'], paths['month'])
+
+    # move every country of one region to a region with none, so the old groups must disappear
+    for path in (paths['year'], paths['month']):
+        frame = pd.read_csv(path)
+        old_region = frame['region'].value_counts().index[-1]
+        new_region = next(r for r in REGIONS if r not in set(frame['region']))
+        frame['region'] = frame['region'].replace(old_region, new_region)
+        frame.to_csv(path, index=False)
+    counts = etl.load_incremental(paths['year'], paths['month'])
+    assert counts['inserted'] == counts['updated'] == 0
+
+    routed = _region_totals(use_rollups=True)
+    assert old_region not in set(routed['region'])
+    pd.testing.assert_frame_equal(routed, _region_totals(use_rollups=False), check_dtype=False)
+
+def test_directory_load_applies_overlapping_files_in_path_order(database_dir):
+    # same countries and months with different figures: the later path wins
+    paths = write_csvs(database_dir / 'a', locations=8, years=2, seed=1)
+    (database_dir / 'b').mkdir()
+    for path in paths.values():
+        frame = pd.read_csv(path)
+        if 'measles_total' in frame:
+            frame['measles_total'] = frame['measles_total'] * 2 + 1
+        frame.to_csv(database_dir / 'b' / path.name, index=False)
+    etl.load_directory(database_dir, workers=2)
+
+    expected = pd.read_csv(database_dir / 'b' / 'cases_month.csv')
+    expected = expected.groupby(['year', 'month'], as_index=False)['measles_total'].sum()
+    loaded = get_aggregated_cases('measles_total', group_by=('year', 'month'), use_rollups=False)
+    merged = expected.merge(loaded, on=['year', 'month'], suffixes=('', '_loaded'))
+    assert len(merged) == len(expected)
+    assert (merged['measles_total'] == merged['measles_total_loaded']).all()
+
+def test_incremental_reload_updates_only_the_corrected_row(database_dir):
+    paths = write_csvs(database_dir, locations=10, years=2, seed=3)
+    first = etl.load_incremental(paths['year'], paths['month'])
+    rows = first['inserted']
+    assert first == {'inserted': rows, 'updated': 0, 'unchanged': 0}
+
+    frame = pd.read_csv(paths['month'])
+    frame.loc[5, 'measles_total'] = 12345
+    frame.to_csv(paths['month'], index=False)
+    counts = etl.load_incremental(paths['year'], paths['month'])
+    assert counts == {'inserted': 0, 'updated': 1, 'unchanged': rows - 1}
+
+    row = frame.loc[5]
+    date = f"{row['year']}-{row['month']:02d}-01"
+    stored = CaseData.get((CaseData.country_iso3 == row['iso3']) & (CaseData.date == date))
+    assert stored.measles_total == 12345
+
+def test_find_csv_files_skips_hidden_directories_and_unreadable_files(tmp_path, capsys):
+    paths = write_csvs(tmp_path, locations=4, years=2, seed=1)
+    write_csvs(tmp_path / '.venv' / 'data', locations=4, years=2, seed=1)
+    (tmp_path / 'latin1.csv').write_bytes('iso3,pa\xefs\n'.encode('latin-1') + b'\xff\xfe\x00\x81\n')
+    (tmp_path / 'ragged.csv').write_text('"iso3,country\n')
+
+    files = etl.find_csv_files(tmp_path)
+    assert files == {'month': [paths['month']], 'year': [paths['year']]}
+    output = capsys.readouterr().out
+    assert "Skipping" in output and 'latin1.csv' in output and 'ragged.csv' in output
+
+def test_empty_extract_loads_without_decompositions(database_dir, capsys):
+    paths = write_csvs(database_dir, locations=4, years=1, seed=1)
+    for path in paths.values():
+        pd.read_csv(path).iloc[:0].to_csv(path, index=False)
+    etl.main([])
+    output = capsys.readouterr().out
+    assert "Seasonal decompositions: skipped." in output
+    assert "Snapshot: 0 rows" in output
@@ -0,0 +1,61 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from measles_data.models import CASE_COLUMNS
+from measles_data.queries import get_aggregated_cases, get_cases, iter_case_pages
+
+GROUPINGS = [('date', 'region'), ('year', 'month'), ('month',), ('region', 'month'), ('year',), ('region',),
+             ('iso3', 'year'), ('country',), ()]
+FILTERS = [
+    {},
+    {'regions': ['AFR', 'EUR']},
+    {'date_range': ('2015-01-01', '2019-12-31')},
+    {'date_range': ('2019-03-01', '2019-06-30'), 'regions': ['SEAR']},
+]
+
+@pytest.mark.parametrize('group_by, agg, filters',
+                         list(itertools.product(GROUPINGS, ['sum', 'mean', 'count'], FILTERS)))
+def test_rollups_match_case_data(group_by, agg, filters):
+    routed = get_aggregated_cases('measles_total', group_by=group_by, agg=agg, **filters)
+    direct = get_aggregated_cases('measles_total', group_by=group_by, agg=agg, use_rollups=False, **filters)
+    assert len(direct)
+    columns = list(group_by)
+    if columns:
+        routed, direct = (f.sort_values(columns, ignore_index=True) for f in (routed, direct))
+    pd.testing.assert_frame_equal(routed, direct, check_dtype=False)
+
+def _model_frame(cases):
+    # The row path's CaseData instances in the columns of the frame path
+    return pd.DataFrame({
+        'iso3': [case.country_iso3.iso3 for case in cases],
+        'country': [case.country_iso3.country for case in cases],
+        'region': [case.country_iso3.region for case in cases],
+        'date': pd.to_datetime([case.date for case in cases]),
+        **{c: [getattr(case, c) for case in cases] for c in CASE_COLUMNS},
+    })
+
+@pytest.mark.parametrize('iso3_codes, start_date, end_date', [
+    (['IND', 'fra', 'DZA'], None, None),
+    ('USA', '2018-01-01', None),
+    (None, '2019-01-01', '2019-06-30'),
+])
+def test_frame_path_matches_row_path(iso3_codes, start_date, end_date):
+    frame = get_cases(iso3_codes, start_date, end_date, as_frame=True)
+    rows = _model_frame(get_cases(iso3_codes, start_date, end_date))
+    assert len(frame)
+    pd.testing.assert_frame_equal(frame, rows, check_dtype=False)
+
+def test_keyset_pages_return_every_row_once():
+    expected = get_cases(None, '2019-01-01', '2019-12-31', as_frame=True)
+    keys = list(zip(expected['date'].dt.strftime('%Y-%m-%d'), expected['iso3']))
+    rows = len(keys)
+    # 7 puts page boundaries inside a month (rows tied on date); a divisor ends exactly on a page
+    divisor = next(d for d in range(50, rows) if rows % d == 0)
+    for page_size in (7, divisor, rows, rows + 1):
+        pages = list(iter_case_pages(None, '2019-01-01', '2019-12-31', page_size=page_size))
+        assert all(0 < len(page) <= page_size for page in pages)
+        assert [(row.date, row.iso3) for page in pages for row in page] == keys
+        if page_size == 7:
+            assert any(a[-1].date == b[0].date for a, b in zip(pages, pages[1:]))
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from measles_data import seasonal
+from measles_data.synthetic import generate
+
+@pytest.fixture
+def dataset(monkeypatch):
+    # Synthetic months in the layout of cache.get_dataset(), counts as float64 with NaN gaps
+    monthly = generate(locations=40, years=4, seed=5)[0]
+    data = monthly[['region', 'iso3']].copy()
+    data[['year', 'month']] = monthly[['year', 'month']].astype('int64')
+    for column in ('measles_total', 'rubella_total'):
+        data[column] = monthly[column].astype('float64')
+    monkeypatch.setattr(seasonal, 'get_dataset', lambda: data)
+    return data
+
+def _stats(column, regions):
+    # a fresh version key per call, so the memoized results of other tests are not reused
+    return seasonal._seasonal_stats(column, regions, object())
+
+@pytest.mark.parametrize('column', ['measles_total', 'rubella_total'])
+def test_stats_match_pandas_groupby(dataset, column):
+    regions = tuple(sorted(dataset['region'].unique())[:3])
+    stats = _stats(column, regions)
+    selected = dataset[dataset['region'].isin(regions)]
+    by_month = selected.groupby('month')[column]
+
+    heatmap = selected.groupby(['month', 'year'])[column].sum(min_count=1).unstack('year')
+    pd.testing.assert_frame_equal(stats['heatmap'], heatmap.dropna(axis=1, how='all'), check_names=False)
+    pd.testing.assert_series_equal(stats['monthly_mean'], by_month.mean(), check_names=False)
+    regional = selected.groupby(['month', 'region'])[column].mean().unstack('region')[list(regions)]
+    pd.testing.assert_frame_equal(stats['regional_mean'], regional, check_names=False)
+
+    expected = by_month.agg(['mean', 'median', 'std', 'min', 'max', 'count'])
+    expected.columns = ['Mean', 'Median', 'Std Dev', 'Min', 'Max', 'Count']
+    pd.testing.assert_frame_equal(stats['month_stats'].reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False)
+    for month, values in zip(seasonal.MONTHS, stats['by_month']):
+        np.testing.assert_array_equal(values, selected.loc[selected['month'] == month, column].dropna())
+    assert stats['peak_month'] == by_month.mean().idxmax()
+    assert stats['trough_month'] == by_month.mean().idxmin()
+
+def test_all_blank_metric_has_no_peak_or_trough(dataset):
+    dataset['rubella_total'] = np.nan
+    stats = _stats('rubella_total', tuple(sorted(dataset['region'].unique())))
+    assert stats['peak_month'] is None and stats['trough_month'] is None
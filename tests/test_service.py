@@ -0,0 +1,67 @@
+import gzip
+import json
+
+from tornado.testing import AsyncHTTPTestCase
+
+from measles_data import service
+
+class ServiceTest(AsyncHTTPTestCase):
+    def get_app(self):
+        service.response_cache.clear()
+        return service.make_app()
+
+    def get(self, path, **headers):
+        return self.fetch(path, headers=headers, decompress_response=False)
+
+    def assert_bad_request(self, path, message):
+        response = self.get(path)
+        self.assertEqual(response.code, 400, path)
+        body = json.loads(response.body)
+        self.assertEqual(body['status'], 400)
+        self.assertIn(message, body['error'])
+
+    def test_etag_revalidation_returns_304_without_a_body(self):
+        response = self.get('/api/countries/IND/cases?start=2019-01-01&end=2019-12-31')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(len(json.loads(response.body)), 12)
+        etag = response.headers['Etag']
+
+        revalidated = self.get('/api/countries/IND/cases?start=2019-01-01&end=2019-12-31', **{'If-None-Match': etag})
+        self.assertEqual(revalidated.code, 304)
+        self.assertEqual(revalidated.body, b'')
+        other = self.get('/api/countries/IND/cases?start=2019-01-01&end=2019-06-30', **{'If-None-Match': etag})
+        self.assertEqual(other.code, 200)
+
+    def test_gzip_and_identity_are_separate_variants(self):
+        identity = self.get('/api/countries')
+        gzipped = self.get('/api/countries', **{'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', identity.headers)
+        self.assertEqual(gzipped.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.body), identity.body)
+        self.assertNotEqual(gzipped.headers['Etag'], identity.headers['Etag'])
+        self.assertIn('Accept-Encoding', identity.headers['Vary'])
+
+        # the cached gzip body is served to gzip clients only
+        again = self.get('/api/countries')
+        self.assertEqual(again.body, identity.body)
+        self.assertEqual(self.get('/api/countries', **{'If-None-Match': identity.headers['Etag'],
+                                                       'Accept-Encoding': 'gzip'}).code, 200)
+
+    def test_invalid_arguments_return_400(self):
+        self.assert_bad_request('/api/cases?start=&end=2019-01-01', "invalid start")
+        self.assert_bad_request('/api/cases?start=2019-01-01&end=soon', "invalid end")
+        self.assert_bad_request('/api/cases?end=2019-01-01', "missing start")
+        self.assert_bad_request('/api/countries?format=xml', "unknown format")
+        self.assert_bad_request('/api/aggregates?metric=deaths', "unknown metric")
+        self.assert_bad_request('/api/aggregates?agg=median', "unknown agg")
+        self.assert_bad_request('/api/aggregates?group_by=date,planet', "unknown group_by: planet")
+        self.assert_bad_request('/api/aggregates?regions=EUR,XYZ', "unknown regions: XYZ")
+
+    def test_known_regions_are_aggregated(self):
+        response = self.get('/api/aggregates?regions=EUR&group_by=region&start=2019-01-01&end=2019-12-31')
+        self.assertEqual(response.code, 200)
+        self.assertEqual([row['region'] for row in json.loads(response.body)], ['EUR'])
+
+    def test_unknown_country_is_404(self):
+        self.assertEqual(self.get('/api/countries/XYZ').code, 404)
+        self.assertEqual(self.get('/api/countries/XYZ/cases').code, 404)